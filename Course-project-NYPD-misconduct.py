@@ -562,6 +562,18 @@ df = pd.concat([df, incident_year_dummies], axis=1)
 print(df.columns)
 
 
+# The cells above build every derived variable on the full dataset, even when only one figure or one model is needed. The same variables are also registered as lazy expressions in `nypd_misconduct.derived`: a `LazyFrame` reads only the raw columns that a request depends on, computes the derived columns on demand, and drops intermediate columns once nothing else needs them. For example, Figure 9 only needs the officer and impacted person race columns.
+
+# In[ ]:
+
+
+from nypd_misconduct.derived import FIGURE_COLUMNS, LazyFrame, raw_sources
+
+print(raw_sources(FIGURE_COLUMNS[9]))
+lazy_df = LazyFrame(data)  # the raw frame loaded above, so the CSV is not read again
+print(lazy_df.compute(FIGURE_COLUMNS[9])['Race_mismatch'].value_counts())
+
+
 # # 4. Results
 
 # In the results section, two primary approaches are conducted to address the research questions. First, a logistic regression model will be used to explore the factors that can explain why an officer is disciplined or not. Second, for those officers who received discipline, I used a decision tree model to classify the types of discipline or punishments administered under various conditions.
@@ -677,6 +689,83 @@ result = model.fit(cov_type='HC3')
 print(result.summary())
 
 
+# ### 4-1-4. Specification batch
+
+# Models 4-1-1 to 4-1-3 are nested specifications of the same outcome. Instead of rebuilding `X` for every variation, the specification batch takes a list of formulas, builds one shared design matrix, and fits the smallest model first, then every other model warm-started from it. The result is one tidy coefficient table with one row per model and term, which makes it cheap to add or drop mismatch terms, interactions, or year windows and compare the coefficients side by side (a specification curve).
+
+# In[ ]:
+
+
+from nypd_misconduct.columns import BASE_FEATURES
+from nypd_misconduct.specifications import fit_specifications
+
+base_formula = 'Penalty_binary ~ ' + ' + '.join(BASE_FEATURES)
+specifications = {
+    '4-1-1': base_formula,
+    '4-1-2': base_formula + ' + Year_*',
+    'no mismatch': base_formula + ' - Sex_mismatch - Race_mismatch',
+    'race mismatch x force': base_formula + ' + Race_mismatch:FADO_Force',
+    # Year fixed effects on incidents from 2010 on only, 2010 as the reference year
+    'years 2010-2022': base_formula + ' + Year_201?.0 + Year_202?.0 - Year_2010.0',
+}
+# max_workers=1 fits in this process: this script has no `if __name__ == '__main__'` guard,
+# and worker processes started with spawn would re-run it from the top
+spec_table = fit_specifications(new_df, specifications, family='logit', max_workers=1,
+                                subsets={'years 2010-2022': 'IncidentYear >= 2010'})
+lpm_table = fit_specifications(new_df, {'4-1-3': base_formula + ' + Year_*'}, family='lpm',
+                               max_workers=1)
+
+# Coefficient of officer race across the specifications
+print(spec_table[spec_table['term'] == 'Police_race_white'])
+
+
+# ### 4-1-5. Subgroup penalty disparities
+
+# The regression models give one average effect per variable, but the research question is how penalty rates vary across combinations of officer and impacted person characteristics. The disparity table below reports the penalty rate of every subgroup formed by officer race, impacted person race, officer sex, officer rank, allegation type and incident year (alone or in any combination), together with the rate ratio against all other allegations and their 95% intervals. All subgroups are computed in one pass over the data, and the results are cached, so exploring different subgroups does not require rerunning the analysis.
+
+# In[ ]:
+
+
+from nypd_misconduct.disparity import penalty_disparities
+
+disparities = penalty_disparities(df)
+
+# Officer race x impacted person race
+race_cells = disparities[(disparities['n_dimensions'] == 2)
+                         & disparities['Police_race_white'].notna()
+                         & disparities['Impacted_race_white'].notna()]
+print(race_cells[['Police_race_white', 'Impacted_race_white', 'n', 'rate',
+                  'rate_lower', 'rate_upper', 'rate_ratio', 'ratio_lower', 'ratio_upper']])
+
+
+# ### 4-1-6. Multiple imputation
+
+# Dropping every row with a missing value discards nearly half of the data (unknown races, ages outside 10-99, and so on), and the dropped allegations may not be a random subset. As a robustness check, the models are re-estimated with multiple imputation: the missing sex, race, rank and age values are imputed 20 times by chained equations, the models are fitted on each completed dataset, and the estimates are pooled with Rubin's rules. Pending penalties are still excluded, since the outcome itself is not imputed.
+
+# In[ ]:
+
+
+from nypd_misconduct.imputation import multiple_imputation
+
+# max_workers=1: no worker processes from this unguarded script (see 4-1-4)
+print(multiple_imputation(df, model='logit', m=20, max_workers=1))              # 4-1-1
+print(multiple_imputation(df, model='lpm', m=20, years=True, max_workers=1))    # 4-1-3
+
+
+# ### 4-1-7. Regularized logit with interactions
+
+# The models above only include main effects. The gap in penalties for race mismatch may depend on the type of allegation, the officer's rank and the year, but fully interacting these factors gives hundreds of terms, most of which are rare. A lasso logit over all of their interactions is fitted along a path of penalties, with the penalty chosen by 5-fold cross-validation (the largest penalty within one standard error of the best), and the interactions that survive are reported.
+
+# In[ ]:
+
+
+from nypd_misconduct.regularized import regularized_logit
+
+terms, path = regularized_logit(df, rule='1se', max_workers=1)  # in-process, see 4-1-4
+print(path[path['chosen']])
+print(terms[terms['selected']].sort_values('order'))
+
+
 # ## 4-2. Decision tree models
 
 # The decision tree model is used to classify the types of discipline given to officers who receive disciplinary actions. From most severe to least severe, there are three major types of discipline, including: (1) Charges and Specifications, (2) Command Disciplines, and (3) Instructions or Formalized Training.
@@ -684,7 +773,6 @@ print(result.summary())
 # In[31]:
 
 
-from sklearn.datasets import load_iris
 from sklearn.tree import DecisionTreeClassifier, plot_tree
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report, precision_recall_curve, average_precision_score
@@ -787,6 +875,18 @@ plt.title("Figure 11: Decision tree for disciplne types")
 plt.show()
 
 
+# Drawing the tree takes a long time and the picture is hard to read. The same tree is also exported as text, JSON and Graphviz DOT files, which is almost instant. To measure how much each feature matters, the permutation importance below shuffles one feature at a time in the testing set and records how much the accuracy drops.
+
+# In[ ]:
+
+
+from nypd_misconduct.trees import export_tree, permutation_importance
+
+export_tree(dtree, 'decision_tree_4-2-1', feature_names=X.columns)
+importance = permutation_importance(dtree, X_test, y_test, n_repeats=10, max_workers=1)
+print(importance)
+
+
 # ### 4-2-2. Decision tree model with years
 
 # In the decision tree model that includes the year variable, I added the incident year to explore the effect of time. It is important to note that this approach may provide a more intuitive understanding of the year's impact, as I directly adopted the year variable as a continuous variable, rather than converting it into a series of dummy variables. The setup of other variables remains the same as in the model without the year.
@@ -862,6 +962,49 @@ plt.title("Figure 12: Decision tree for disciplne types")
 plt.show()
 
 
+# Text, JSON and DOT exports and permutation importance of the tree with years.
+
+# In[ ]:
+
+
+from nypd_misconduct.trees import export_tree, permutation_importance
+
+export_tree(dtree, 'decision_tree_4-2-2', feature_names=X.columns)
+importance = permutation_importance(dtree, X_test, y_test, n_repeats=10, max_workers=1)
+print(importance)
+
+
+# ### 4-2-3. Multinomial and ordinal logit
+
+# The trees above describe the discipline types but give no effect sizes or standard errors. The same outcome is modeled with a multinomial logit (each type against instructions and trainings) and an ordinal logit, which treats the three types as increasing in severity, so that a positive coefficient means harsher discipline. Both report robust standard errors.
+
+# In[ ]:
+
+
+from nypd_misconduct.multinomial import benchmark, fit_multinomial_specifications
+
+discipline_formula = 'Penalty_categories ~ ' + ' + '.join(BASE_FEATURES)
+discipline_specifications = {
+    '4-2-1': discipline_formula,
+    '4-2-2': discipline_formula + ' + IncidentYear',
+    'years fixed effect': discipline_formula + ' + Year_*',
+}
+# max_workers=1: no worker processes from this unguarded script (see 4-1-4)
+multinomial_table = fit_multinomial_specifications(new_df, discipline_specifications, model='multinomial',
+                                                   max_workers=1)
+ordinal_table = fit_multinomial_specifications(new_df, discipline_specifications, model='ordinal',
+                                               max_workers=1)
+print(ordinal_table[ordinal_table['term'].isin(['Police_rank_mangerial', 'Race_mismatch'])])
+
+
+# Both logits are compared with the tree of Section 4-2-1 on the same training and testing sets: time to fit, and accuracy and log-loss on the testing set.
+
+# In[ ]:
+
+
+print(benchmark(new_df))
+
+
 # # 5. Conclusion
 
 # This pilot project utilizes NYPD Misconduct Complaint data to explore two research questions: (1) What factors explain whether police officers are penalized for their misconduct? and (2) Among officers who received penalties, what factors explain the variation in penalties given? Two distinct statistical approaches are employed: regression models and decision tree models.
@@ -0,0 +1,7 @@
+"""Helpers for the NYPD misconduct course project.
+
+The analysis itself lives in ``Course-project-NYPD-misconduct.py``; the
+modules in this package hold the reusable pieces that the script (and
+anything else) can import.  Submodules are deliberately not imported here
+so that ``import nypd_misconduct`` stays cheap.
+"""
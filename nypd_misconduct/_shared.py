@@ -0,0 +1,101 @@
+"""Share read-only arrays with worker processes through shared memory.
+
+``worker_pool`` is the one way the modules of this package run tasks in
+parallel: the arrays are copied into shared memory once, every worker maps
+them and hands them to the module's ``setup`` function, which keeps them in
+module state for the tasks.  With ``max_workers=1`` no process is started and
+``setup`` receives the arrays themselves.
+"""
+
+import contextlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+@contextlib.contextmanager
+def shared_array(values):
+    """Copy ``values`` into shared memory once; yields the handle for ``attach``.
+
+    The block is released when the ``with`` block exits.
+    """
+    values = np.ascontiguousarray(values)
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        yield block.name, values.shape, values.dtype.str
+    finally:
+        block.close()
+        block.unlink()
+
+
+def attach(handle):
+    """Map the array behind ``handle`` in a worker.
+
+    Returns the array and the block, which must stay referenced as long as
+    the array is used.
+    """
+    name, shape, dtype = handle
+    block = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf), block
+
+
+def limit_threads():
+    """Keep BLAS to one thread per worker so processes do not oversubscribe."""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    # Kept alive for the life of the worker
+    limit_threads.limits = threadpool_limits(1)
+
+
+# Shared-memory blocks attached by this worker; they back the arrays handed
+# to ``setup`` and must live as long as the worker
+_blocks = []
+
+
+def _init_worker(setup, handles, args):
+    limit_threads()
+    arrays = []
+    for handle in handles:
+        array, block = attach(handle)
+        arrays.append(array)
+        _blocks.append(block)
+    setup(*arrays, *args)
+
+
+class _InProcess:
+    """Executor stand-in that runs each task in this process when submitted."""
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+
+@contextlib.contextmanager
+def worker_pool(state, setup, arrays=(), args=(), max_workers=1):
+    """Yield an executor whose workers have run ``setup(*arrays, *args)``.
+
+    ``setup`` is a module-level function that stores what the tasks need in
+    ``state``, the module's dict of worker state.  ``arrays`` are shared with
+    the ``max_workers`` processes through shared memory; ``args`` are pickled
+    to each of them.  With ``max_workers=1`` the yielded executor runs every
+    task in this process and ``state`` is cleared on exit.
+    """
+    if max_workers == 1:
+        setup(*(np.ascontiguousarray(values) for values in arrays), *args)
+        try:
+            yield _InProcess()
+        finally:
+            state.clear()
+        return
+    with contextlib.ExitStack() as stack:
+        handles = [stack.enter_context(shared_array(values)) for values in arrays]
+        yield stack.enter_context(ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(setup, handles, args)))
@@ -0,0 +1,307 @@
+"""Command line interface for the analysis.
+
+Each step of the script is a subcommand that imports only what it needs, so
+printing one regression table does not pay for seaborn, scikit-learn or the
+figures::
+
+    nypd-misconduct ingest raw.csv raw.parquet
+    nypd-misconduct recode raw.parquet new_df.parquet --outcome Penalty_binary
+    nypd-misconduct figures raw.parquet --figure 1 9 --out-dir figures
+    nypd-misconduct logit raw.parquet --years
+    nypd-misconduct lpm raw.parquet
+    nypd-misconduct tree raw.parquet --years --export tree --save tree.pkl
+    nypd-misconduct mlogit raw.parquet --model ordinal --benchmark
+    nypd-misconduct score tree.pkl raw.parquet
+
+``SOURCE`` is the raw CSV, a Parquet copy from ``ingest``, or a frame written
+by ``recode``.  ``--timing`` reports how long the imports and the whole
+command took; ``python -X importtime -m nypd_misconduct ...`` breaks the
+import cost down by module.
+"""
+
+import argparse
+import contextlib
+import sys
+import time
+
+_START = time.perf_counter()
+_timings = {}
+
+
+@contextlib.contextmanager
+def _timed(label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[label] = _timings.get(label, 0.0) + time.perf_counter() - start
+
+
+def _columns(source):
+    with _timed('import'):
+        import pandas as pd
+    if str(source).lower().endswith('.parquet'):
+        import pyarrow.parquet
+
+        return pyarrow.parquet.read_schema(source).names
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def _write(frame, path):
+    if str(path).lower().endswith('.parquet'):
+        frame.to_parquet(path)
+    else:
+        frame.to_csv(path)
+
+
+def _model_frame(args, outcome):
+    """``new_df`` for ``outcome`` from ``args.source``, recoding only if needed."""
+    with _timed('import'):
+        import pandas as pd
+        from .columns import MODEL_COLUMNS
+    columns = [outcome] + MODEL_COLUMNS
+    available = set(_columns(args.source))
+    if set(MODEL_COLUMNS) <= available and outcome not in available:
+        # A recoded frame has no raw columns left to recode the outcome from
+        raise SystemExit(f"nypd-misconduct: error: {args.source} is a recoded frame without "
+                         f"'{outcome}'; write one with 'recode --outcome {outcome}'")
+    if set(columns) <= available:
+        if str(args.source).lower().endswith('.parquet'):
+            frame = pd.read_parquet(args.source, columns=columns)
+        else:
+            frame = pd.read_csv(args.source, usecols=columns, index_col=None)
+        return frame.dropna()
+    if args.backend == 'sql':
+        with _timed('import'):
+            from .sql_backend import build_new_df
+        return build_new_df(args.source, outcome=outcome, threads=args.threads)
+    with _timed('import'):
+        from .derived import LazyFrame
+    return LazyFrame(args.source).model_frame(outcome)
+
+
+def _features(years, year_dummies=False):
+    from .columns import BASE_FEATURES, YEAR_DUMMIES
+
+    if not years:
+        return list(BASE_FEATURES)
+    return BASE_FEATURES + (YEAR_DUMMIES if year_dummies else ['IncidentYear'])
+
+
+### Subcommands
+
+def ingest(args):
+    """Copy the raw CSV columns used by the analysis to Parquet."""
+    with _timed('import'):
+        import pandas as pd
+        from .derived import REGISTRY, raw_sources
+    columns = raw_sources(list(REGISTRY))
+    data = pd.read_csv(args.csv, usecols=columns, low_memory=False)
+    data.to_parquet(args.out)
+    print(f"Wrote {len(data)} rows x {len(columns)} columns to {args.out}")
+
+
+def recode(args):
+    """Write the modelling frame (new_df) for one outcome."""
+    frame = _model_frame(args, args.outcome)
+    _write(frame, args.out)
+    print(f"Wrote {len(frame)} rows to {args.out}")
+
+
+def figures(args):
+    """Draw Figures 1-10, computing only the columns they use."""
+    import os
+
+    with _timed('import'):
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from .derived import FIGURE_COLUMNS, LazyFrame
+        from .figures import FIGURES
+    numbers = args.figure or sorted(FIGURES)
+    columns = list(dict.fromkeys(column for number in numbers for column in FIGURE_COLUMNS[number]))
+    data = LazyFrame(args.source).compute(columns)
+    os.makedirs(args.out_dir, exist_ok=True)
+    for number in numbers:
+        fig = FIGURES[number](data)
+        path = os.path.join(args.out_dir, f'figure_{number}.png')
+        fig.savefig(path, bbox_inches='tight')
+        plt.close(fig)
+        print(path)
+
+
+def _regression(args, family):
+    new_df = _model_frame(args, 'Penalty_binary')
+    with _timed('import'):
+        from .specifications import fit_specifications
+    if args.formula:
+        table = fit_specifications(new_df, args.formula, family=family,
+                                   max_workers=args.workers)
+        if args.out:
+            _write(table, args.out)
+        else:
+            print(table.to_string())
+        return
+    with _timed('import'):
+        import statsmodels.api as sm
+    X = sm.add_constant(new_df[_features(args.years, year_dummies=True)])
+    y = new_df['Penalty_binary']
+    model = sm.Logit(y, X) if family == 'logit' else sm.OLS(y, X)
+    fit_kwargs = {'disp': 0} if family == 'logit' else {}
+    result = model.fit(cov_type='HC3', **fit_kwargs)
+    print(result.summary())
+
+
+def logit(args):
+    """Logistic regression of Section 4-1 (4-1-1, or 4-1-2 with --years)."""
+    _regression(args, 'logit')
+
+
+def lpm(args):
+    """Linear probability model of Section 4-1-3."""
+    _regression(args, 'lpm')
+
+
+def tree(args):
+    """Decision tree of Section 4-2 (4-2-1, or 4-2-2 with --years)."""
+    new_df = _model_frame(args, 'Penalty_categories')
+    with _timed('import'):
+        from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+        from sklearn.model_selection import train_test_split
+        from sklearn.tree import DecisionTreeClassifier
+        from .trees import tree_params
+    X = new_df[_features(args.years)]
+    y = new_df['Penalty_categories']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=676)
+    dtree = DecisionTreeClassifier(**tree_params(args.years))
+    dtree.fit(X_train, y_train)
+    y_pred = dtree.predict(X_test)
+    print("Accuracy:", accuracy_score(y_test, y_pred))
+    print("Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
+    print("Classification Report:\n", classification_report(y_test, y_pred))
+
+    if args.export or args.importance:
+        with _timed('import'):
+            from .trees import export_tree, permutation_importance
+    if args.export:
+        for path in export_tree(dtree, args.export, feature_names=X.columns):
+            print(path)
+    if args.importance:
+        print(permutation_importance(dtree, X_test, y_test, max_workers=args.workers).to_string())
+    if args.plot:
+        with _timed('import'):
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            from sklearn.tree import plot_tree
+            from .trees import class_labels
+        plt.figure(figsize=(60, 20))
+        plot_tree(dtree, filled=True, feature_names=X.columns.tolist(),
+                  class_names=class_labels(dtree),
+                  rounded=True, proportion=False, precision=2, impurity=False, label='none',
+                  fontsize=20)
+        plt.savefig(args.plot, bbox_inches='tight')
+    if args.save:
+        import pickle
+
+        with open(args.save, 'wb') as file:
+            pickle.dump({'model': dtree, 'features': list(X.columns)}, file)
+        print(args.save)
+
+
+def mlogit(args):
+    """Multinomial or ordinal logit of the discipline type (Section 4-2-3)."""
+    new_df = _model_frame(args, 'Penalty_categories')
+    with _timed('import'):
+        from .multinomial import benchmark, fit_multinomial_specifications
+    if args.benchmark:
+        print(benchmark(new_df, features=_features(args.years)).to_string())
+        return
+    formulas = args.formula or ['Penalty_categories ~ ' + ' + '.join(_features(args.years))]
+    table = fit_multinomial_specifications(new_df, formulas, model=args.model,
+                                           max_workers=args.workers)
+    if args.out:
+        _write(table, args.out)
+    else:
+        print(table.to_string())
+
+
+def score(args):
+    """Score a tree saved by tree --save on the discipline outcome."""
+    import pickle
+
+    with open(args.model, 'rb') as file:
+        saved = pickle.load(file)
+    new_df = _model_frame(args, 'Penalty_categories')
+    with _timed('import'):
+        from sklearn.metrics import accuracy_score, classification_report
+    X, y = new_df[saved['features']], new_df['Penalty_categories']
+    y_pred = saved['model'].predict(X)
+    print("Accuracy:", accuracy_score(y, y_pred))
+    print("Classification Report:\n", classification_report(y, y_pred))
+    if args.out:
+        _write(new_df.assign(prediction=y_pred)[['Penalty_categories', 'prediction']], args.out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='nypd-misconduct', description=__doc__.splitlines()[0])
+    parser.add_argument('--timing', action='store_true',
+                        help="report import and total time on stderr")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add(func, *arguments):
+        sub = subparsers.add_parser(func.__name__, help=func.__doc__.splitlines()[0].rstrip('.'))
+        sub.set_defaults(func=func)
+        for names, options in arguments:
+            sub.add_argument(*names, **options)
+        return sub
+
+    source = (['source'], {'help': "raw CSV, Parquet copy, or recoded frame"})
+    backend = (['--backend'], {'choices': ['pandas', 'sql'], 'default': 'pandas',
+                               'help': "recode with pandas or with DuckDB (default: pandas)"})
+    threads = (['--threads'], {'type': int, 'help': "threads for the SQL backend"})
+    years = (['--years'], {'action': 'store_true', 'help': "add the incident year"})
+    workers = (['--workers'], {'type': int, 'help': "worker processes"})
+
+    add(ingest, (['csv'], {}), (['out'], {'help': "Parquet file to write"}))
+    add(recode, source, (['out'], {'help': ".parquet or .csv file to write"}),
+        (['--outcome'], {'choices': ['Penalty_binary', 'Penalty_categories'],
+                         'default': 'Penalty_binary'}), backend, threads)
+    add(figures, source, (['--figure'], {'type': int, 'nargs': '+', 'choices': range(1, 11),
+                                         'help': "figure numbers (default: all)"}),
+        (['--out-dir'], {'default': 'figures'}))
+    for func in (logit, lpm):
+        add(func, source, years, backend, threads, workers,
+            (['--formula'], {'action': 'append',
+                             'help': "fit these formulas as a specification batch (repeatable)"}),
+            (['--out'], {'help': "write the specification table here"}))
+    add(tree, source, years, backend, threads, workers,
+        (['--export'], {'metavar': 'PREFIX', 'help': "write PREFIX.txt/.json/.dot"}),
+        (['--importance'], {'action': 'store_true', 'help': "permutation importance"}),
+        (['--plot'], {'metavar': 'PNG', 'help': "draw the tree like Figures 11 and 12"}),
+        (['--save'], {'metavar': 'PICKLE', 'help': "save the fitted tree"}))
+    add(mlogit, source, years, backend, threads, workers,
+        (['--model'], {'choices': ['multinomial', 'ordinal'], 'default': 'multinomial'}),
+        (['--formula'], {'action': 'append',
+                         'help': "fit these formulas as a specification batch (repeatable)"}),
+        (['--benchmark'], {'action': 'store_true',
+                           'help': "compare both logits with the tree instead"}),
+        (['--out'], {'help': "write the coefficient table here"}))
+    add(score, (['model'], {'help': "tree saved by 'tree --save'"}), source, backend, threads,
+        (['--out'], {'help': "write predictions here"}))
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        if args.timing:
+            total = time.perf_counter() - _START
+            print(f"imports: {_timings.get('import', 0.0):.3f}s, total: {total:.3f}s",
+                  file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""Column names shared by the models in Section 4."""
+
+# Explanatory variables used by every model in Sections 4-1 and 4-2
+BASE_FEATURES = [
+    'Police_rank_mangerial', 'Police_sex_male', 'Police_race_white',
+    'Impacted_sex_male', 'Impacted_age_recoded', 'Impacted_race_white',
+    'FADO_Discourtesy', 'FADO_Force', 'FADO_Offensive language',
+    'Sex_mismatch', 'Race_mismatch',
+]
+
+# Year fixed effects (2000 is the reference year dropped by get_dummies)
+YEAR_DUMMIES = [f'Year_{year}.0' for year in range(2001, 2023)]
+
+# Everything kept in new_df besides the outcome
+MODEL_COLUMNS = BASE_FEATURES + ['IncidentYear'] + YEAR_DUMMIES
@@ -0,0 +1,284 @@
+"""Lazily computed derived variables.
+
+Section 3 of the script builds every derived column on the full ``df`` up
+front.  Here each derived variable is registered once, together with the
+columns it is computed from, and ``LazyFrame`` computes only what a model,
+figure or export asks for.  Raw columns are read from the CSV only when some
+requested variable depends on them, and every intermediate column is dropped
+as soon as the last variable that needs it has been computed::
+
+    frame = LazyFrame('CCRB Complaint Database Raw 04.28.2023.csv')
+    frame.compute(FIGURE_COLUMNS[9])      # reads OfficerRace and ImpactedRace only
+    new_df = frame.model_frame('Penalty_binary')
+
+The recoding rules are the ones of Section 3; each recoder is applied to the
+distinct values of its column rather than to every row.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .columns import MODEL_COLUMNS, YEAR_DUMMIES
+
+# name -> (source columns, function of those columns returning a Series)
+REGISTRY = {}
+
+
+def register(name, *sources):
+    """Register the decorated function as the recipe for derived column ``name``."""
+    def decorator(func):
+        REGISTRY[name] = (sources, func)
+        return func
+    return decorator
+
+
+def _recode(series, recoder):
+    # Apply the recoder once per distinct value instead of once per row
+    codes, uniques = pd.factorize(series)
+    recoded = [recoder(value) for value in uniques]
+    if (codes == -1).any():
+        recoded.append(recoder(np.nan))  # picked up by the -1 codes of missing values
+    values = pd.Series(recoded, dtype=None if recoded else float).to_numpy()
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+
+### Recoders (same rules as Section 3)
+
+def recode_penalty_binary(description):
+    description = str(description).strip().lower()
+    if "pending" in description:
+        return np.nan
+    elif "no discipline" in description:
+        return 0
+    else:
+        return 1
+
+
+def recode_penalty_descriptions(description):
+    description = str(description).strip().lower()
+    charges_and_specifications = ['loss of vacation', 'resigned/retired', 'probation', 'suspension', 'termination']
+    if "pending" in description or "no discipline" in description:
+        return np.nan
+    elif "command discipline" in description:
+        return "Command discipline"
+    elif "reprimand" in description:
+        return 'Instructions and trainings'
+    elif any(position in description for position in charges_and_specifications):
+        return 'Charges and specifications'
+    else:
+        return 'Unspecified'  # reported once by ``penalty_categories``
+
+
+def gender_recoder(gender):
+    if pd.isna(gender):
+        return gender
+    if 'female' in gender.lower():
+        return 0
+    elif 'male' in gender.lower():
+        return 1
+    else:
+        return np.nan
+
+
+def race_recoder(race):
+    NA_list = ['Unknown', 'Refused', 'Decline to Answer (NA)']
+    White_list = ['White', 'White/Caucasian (R)']
+    if pd.isna(race):
+        return race
+    elif any(position in race for position in NA_list):
+        return np.nan
+    elif any(position in race for position in White_list):
+        return 1
+    else:
+        return 0
+
+
+def age_recoder(age_num):
+    if age_num < 10:
+        return np.nan
+    elif age_num > 99:
+        return np.nan
+    else:
+        return age_num
+
+
+def rank_recoder(rank):
+    non_managerial = ['Police Officer', 'Detective']
+    managerial = ['Sergeant', 'Lieutenant', 'Captain', 'Deputy Inspector', 'Chiefs and other ranks']
+    if any(position in rank for position in managerial):
+        return 1
+    elif any(position in rank for position in non_managerial):
+        return 0
+    else:
+        return np.nan
+
+
+def fado_recoder(fado):
+    if pd.isna(fado):
+        return fado
+    elif 'Abuse' in fado:
+        return 'Abuse of authority'
+    elif 'Force' in fado:
+        return 'Force'
+    elif 'Discourtesy' in fado:
+        return 'Discourtesy'
+    elif 'Offensive' in fado:
+        return 'Offensive language'
+    else:
+        return np.nan
+
+
+### Registry
+
+def _register_recode(name, source, recoder):
+    register(name, source)(lambda column: _recode(column, recoder).rename(name))
+
+
+_register_recode('Penalty_binary', 'PenaltyCat', recode_penalty_binary)
+_register_recode('Impacted_sex_male', 'ImpactedGender', gender_recoder)
+_register_recode('Police_sex_male', 'OfficerGender', gender_recoder)
+_register_recode('Impacted_race_white', 'ImpactedRace', race_recoder)
+_register_recode('Police_race_white', 'OfficerRace', race_recoder)
+_register_recode('Impacted_age_recoded', 'ImpactedAge', age_recoder)
+_register_recode('Police_rank_mangerial', 'CurrentRankLong', rank_recoder)
+_register_recode('FADO_recoded', 'FADOType', fado_recoder)
+
+
+@register('Penalty_categories', 'PenaltyCat')
+def penalty_categories(penalty):
+    categories = _recode(penalty, recode_penalty_descriptions).rename('Penalty_categories')
+    # Section 3 prints each unmatched description; here they are one warning
+    unmatched = sorted({str(value) for value in pd.unique(penalty[(categories == 'Unspecified').to_numpy()])})
+    if unmatched:
+        warnings.warn(f"Penalty descriptions recoded as 'Unspecified': {unmatched}", stacklevel=2)
+    return categories
+
+
+def _register_mismatch(name, police, impacted):
+    @register(name, police, impacted)
+    def mismatch(police_column, impacted_column):
+        values = np.where(
+            pd.isna(police_column) | pd.isna(impacted_column),
+            np.nan,
+            np.where(police_column != impacted_column, 1, 0))
+        return pd.Series(values, index=police_column.index, name=name)
+
+
+_register_mismatch('Sex_mismatch', 'Police_sex_male', 'Impacted_sex_male')
+_register_mismatch('Race_mismatch', 'Police_race_white', 'Impacted_race_white')
+
+
+@register('IncidentYear', 'IncidentDate')
+def incident_year(incident_date):
+    year = pd.to_datetime(incident_date).dt.year
+    return year.where((year >= 2000) & (year < 2023)).astype(float).rename('IncidentYear')
+
+
+def _register_dummy(name, source, level):
+    # Same coding as pd.get_dummies(..., drop_first=True): missing -> 0
+    register(name, source)(lambda column: (column == level).astype('int64').rename(name))
+
+
+for _level in ['Discourtesy', 'Force', 'Offensive language']:
+    _register_dummy(f'FADO_{_level}', 'FADO_recoded', _level)
+for _dummy in YEAR_DUMMIES:
+    _register_dummy(_dummy, 'IncidentYear', float(_dummy[len('Year_'):]))
+
+# Derived columns behind each figure of Section 3
+FIGURE_COLUMNS = {
+    1: ['Penalty_binary'],
+    2: ['Penalty_categories'],
+    3: ['Police_sex_male', 'Impacted_sex_male'],
+    4: ['Police_race_white', 'Impacted_race_white'],
+    5: ['Impacted_age_recoded'],
+    6: ['Police_rank_mangerial'],
+    7: ['FADO_recoded'],
+    8: ['Sex_mismatch'],
+    9: ['Race_mismatch'],
+    10: ['IncidentYear'],
+}
+
+
+def plan(names, available=()):
+    """Return every column needed for ``names``, dependencies first.
+
+    Columns in ``available`` are treated as already computed.
+    """
+    order, seen = [], set(available)
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for source in REGISTRY.get(name, ((), None))[0]:
+            visit(source)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def raw_sources(names):
+    """Raw CSV columns that ``names`` are computed from."""
+    return [name for name in plan(names) if name not in REGISTRY]
+
+
+class LazyFrame:
+    """Compute derived variables on demand from a raw CSV or DataFrame.
+
+    ``source`` is the path of the raw CSV or a Parquet copy of it (only the
+    needed columns are read), or an already loaded DataFrame.  Computed columns are not kept between
+    calls unless ``keep=True`` is passed; ``release`` drops kept columns.
+    """
+
+    def __init__(self, source, **read_csv_kwargs):
+        self.source = source
+        self.read_csv_kwargs = {'low_memory': False, **read_csv_kwargs}
+        self.cache = {}
+
+    def _read(self, columns):
+        if isinstance(self.source, pd.DataFrame):
+            return {column: self.source[column] for column in columns}
+        if str(self.source).lower().endswith('.parquet'):
+            data = pd.read_parquet(self.source, columns=columns)
+        else:
+            data = pd.read_csv(self.source, usecols=columns, **self.read_csv_kwargs)
+        return {column: data[column] for column in columns}
+
+    def compute(self, names, keep=False):
+        """Return a DataFrame holding ``names``, computing only what they need."""
+        names = list(names)
+        order = plan(names, available=self.cache)
+        # How many columns still to be computed use each column
+        consumers = {}
+        for name in order:
+            for source in REGISTRY.get(name, ((), None))[0]:
+                consumers[source] = consumers.get(source, 0) + 1
+
+        raw = [name for name in order if name not in REGISTRY]
+        columns = self._read(raw) if raw else {}
+        for name in order:
+            if name in REGISTRY:
+                sources, func = REGISTRY[name]
+                columns[name] = func(*(self.cache.get(source, columns.get(source)) for source in sources))
+                for source in sources:
+                    consumers[source] -= 1
+                    if not consumers[source] and source not in names:
+                        columns.pop(source, None)
+
+        result = pd.DataFrame({name: self.cache.get(name, columns.get(name)) for name in names})
+        if keep:
+            self.cache.update(result.items())
+        return result
+
+    def release(self, names=None):
+        """Drop kept columns (all of them when ``names`` is None)."""
+        for name in list(self.cache) if names is None else names:
+            self.cache.pop(name, None)
+
+    def model_frame(self, outcome='Penalty_binary', columns=MODEL_COLUMNS):
+        """The ``new_df`` of Section 4 for ``outcome``, built lazily."""
+        return self.compute([outcome] + [column for column in columns if column != outcome]).dropna()
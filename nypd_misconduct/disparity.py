@@ -0,0 +1,195 @@
+"""Penalty rates and rate ratios for every subgroup in one pass.
+
+Section 3 looks at one variable at a time.  ``penalty_disparities`` instead
+reports the penalty rate of every cell of every combination of the recoded
+dimensions (all 2^k subsets of ``DIMENSIONS``, from the overall rate down to
+the full cross-classification).  The data are only read once: the rows are
+counted into a joint table of the dimensions with ``np.bincount``, and every
+subgroup is a sum over that table.
+
+For each cell the table holds the number of allegations ``n``, the number
+penalized, the penalty ``rate`` with a Wilson interval, the rate among all
+other allegations (``rate_rest``) and the ``rate_ratio`` between the two with
+a log (Katz) interval.  With ``n_boot`` the intervals are also computed by a
+bootstrap that resamples the joint table (a multinomial draw over its cells,
+which is the same as resampling rows).
+
+Results are cached per data snapshot, so exploring subgroups of the same data
+does not recompute anything.
+"""
+
+import hashlib
+import itertools
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['Police_race_white', 'Impacted_race_white', 'Police_sex_male',
+              'Police_rank_mangerial', 'FADO_recoded', 'IncidentYear']
+
+# Results of earlier calls, keyed by data snapshot and parameters
+_cache = {}
+
+# Bootstrap draws processed at a time (bounds the memory of the draws)
+BOOT_CHUNK = 100
+
+
+def snapshot_key(data, **params):
+    """Hash the contents of ``data`` together with ``params``."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+def joint_table(data, dimensions, outcome):
+    """Count allegations and penalties in every cell of ``dimensions``.
+
+    Returns the levels of each dimension and two arrays shaped like the
+    cross-classification: allegations and penalties per cell.
+    """
+    codes, levels = [], []
+    for dimension in dimensions:
+        dimension_codes, dimension_levels = pd.factorize(data[dimension], sort=True)
+        codes.append(dimension_codes)
+        levels.append(np.asarray(dimension_levels))
+    shape = tuple(len(dimension_levels) for dimension_levels in levels)
+    flat = np.ravel_multi_index(codes, shape) if dimensions else np.zeros(len(data), dtype=int)
+    size = int(np.prod(shape))
+    n = np.bincount(flat, minlength=size).reshape(shape)
+    events = np.bincount(flat, weights=data[outcome].to_numpy(dtype=float), minlength=size).reshape(shape)
+    return levels, n.astype(float), events
+
+
+def _subsets(k):
+    for r in range(k + 1):
+        yield from itertools.combinations(range(k), r)
+
+
+def _margin(table, subset, k, leading=0):
+    # Sum out the dimensions that are not in ``subset``; ``leading`` extra
+    # axes in front (bootstrap draws) are kept.
+    other = tuple(leading + i for i in range(k) if i not in subset)
+    summed = table.sum(axis=other)
+    return summed.reshape(summed.shape[:leading] + (-1,))
+
+
+def wilson_interval(events, n, alpha=0.05):
+    from scipy.stats import norm
+
+    z = norm.ppf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = events / n
+        centre = (rate + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+        half = z * np.sqrt(rate * (1 - rate) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+    return centre - half, centre + half
+
+
+def _ratio(events, n, total_events, total):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = events / n
+        rate_rest = (total_events - events) / (total - n)
+        return rate, rate_rest, rate / rate_rest
+
+
+def _bootstrap(n, events, subsets, k, n_boot, alpha, seed):
+    rng = np.random.default_rng(seed)
+    total = n.sum()
+    probabilities = np.concatenate([events.ravel(), (n - events).ravel()]) / total
+    rates = {subset: [] for subset in subsets}
+    ratios = {subset: [] for subset in subsets}
+    for start in range(0, n_boot, BOOT_CHUNK):
+        draws = rng.multinomial(int(total), probabilities, size=min(BOOT_CHUNK, n_boot - start))
+        boot_events = draws[:, :events.size].reshape((-1,) + n.shape).astype(float)
+        boot_n = boot_events + draws[:, events.size:].reshape((-1,) + n.shape)
+        draw_events = boot_events.reshape(len(draws), -1).sum(axis=1)[:, None]
+        for subset in subsets:
+            cell_events = _margin(boot_events, subset, k, leading=1)
+            cell_n = _margin(boot_n, subset, k, leading=1)
+            rate, _, ratio = _ratio(cell_events, cell_n, draw_events, total)
+            rates[subset].append(rate)
+            ratios[subset].append(ratio)
+    quantiles = [alpha / 2, 1 - alpha / 2]
+    # Cells without a valid draw get NaN bounds; nanquantile warns about them
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', 'All-NaN slice encountered', RuntimeWarning)
+        return {subset: (np.nanquantile(np.concatenate(rates[subset]), quantiles, axis=0),
+                         np.nanquantile(np.concatenate(ratios[subset]), quantiles, axis=0))
+                for subset in subsets}
+
+
+def penalty_disparities(df, dimensions=DIMENSIONS, outcome='Penalty_binary', alpha=0.05,
+                        n_boot=0, seed=676, cache=True, cache_dir=None):
+    """Penalty rates and rate ratios for every subgroup of ``dimensions``.
+
+    Rows missing the outcome or any dimension are dropped.  Returns one row
+    per non-empty cell; dimensions that a row does not condition on are
+    missing (``NaN``) and ``n_dimensions`` counts the ones it does.  With
+    ``n_boot`` > 0 bootstrap percentile intervals are added.  ``cache_dir``
+    additionally keeps results on disk between sessions.
+    """
+    dimensions = list(dimensions)
+    data = df[[outcome] + dimensions].dropna()
+    key = snapshot_key(data, dimensions=dimensions, outcome=outcome, alpha=alpha,
+                       n_boot=n_boot, seed=seed)
+    path = os.path.join(cache_dir, f'disparity-{key}.pkl') if cache_dir else None
+    if cache and key in _cache:
+        return _cache[key].copy()
+    if path and os.path.exists(path):
+        with open(path, 'rb') as file:
+            result = pickle.load(file)
+        if cache:
+            _cache[key] = result.copy()
+        return result
+
+    from scipy.stats import norm
+
+    k = len(dimensions)
+    levels, n, events = joint_table(data, dimensions, outcome)
+    total, total_events = n.sum(), events.sum()
+    subsets = list(_subsets(k))
+    boot = _bootstrap(n, events, subsets, k, n_boot, alpha, seed) if n_boot else None
+    z = norm.ppf(1 - alpha / 2)
+
+    tables = []
+    for subset in subsets:
+        cell_n, cell_events = _margin(n, subset, k), _margin(events, subset, k)
+        rate, rate_rest, ratio = _ratio(cell_events, cell_n, total_events, total)
+        rate_lower, rate_upper = wilson_interval(cell_events, cell_n, alpha)
+        # Katz interval of the ratio; its log standard error is infinite without events on either side
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            log_se = np.sqrt(1 / cell_events - 1 / cell_n
+                             + 1 / (total_events - cell_events) - 1 / (total - cell_n))
+            ratio_lower, ratio_upper = ratio * np.exp(-z * log_se), ratio * np.exp(z * log_se)
+        table = {dimension: np.nan for dimension in dimensions}
+        index = np.indices([len(levels[i]) for i in subset]).reshape(len(subset), cell_n.size)
+        for position, i in enumerate(subset):
+            table[dimensions[i]] = levels[i][index[position]]
+        table.update({
+            'n_dimensions': len(subset),
+            'n': cell_n.astype(int),
+            'penalties': cell_events.astype(int),
+            'rate': rate,
+            'rate_lower': rate_lower,
+            'rate_upper': rate_upper,
+            'rate_rest': rate_rest,
+            'rate_ratio': ratio,
+            'ratio_lower': ratio_lower,
+            'ratio_upper': ratio_upper,
+        })
+        if boot:
+            (table['rate_boot_lower'], table['rate_boot_upper']), \
+                (table['ratio_boot_lower'], table['ratio_boot_upper']) = boot[subset]
+        table = pd.DataFrame(table, index=range(cell_n.size))
+        tables.append(table[table['n'] > 0])
+    result = pd.concat(tables, ignore_index=True)
+
+    if cache:
+        _cache[key] = result.copy()
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'wb') as file:
+            pickle.dump(result, file)
+    return result
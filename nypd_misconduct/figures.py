@@ -0,0 +1,123 @@
+"""Figures 1-10 of Section 3, one function per figure.
+
+Each function takes a DataFrame holding the columns listed for the figure in
+``derived.FIGURE_COLUMNS`` and returns the matplotlib figure, so a single
+figure can be drawn without building the rest of the data.
+"""
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+
+def _annotate(ax):
+    # Adding text on the top of bar
+    for p in ax.patches:
+        ax.annotate(format(p.get_height(), '.0f'),
+                    (p.get_x() + p.get_width() / 2., p.get_height()),
+                    ha='center', va='center',
+                    xytext=(0, 5),
+                    textcoords='offset points',
+                    fontsize=10)
+
+
+def _bar(ax, counts, title, xlabel, ylabel='Frequency', labels=None):
+    sns.barplot(ax=ax, x=counts.index, y=counts.values, palette='coolwarm')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if labels is not None:
+        ax.set_xticks(range(len(labels)), labels=labels)
+
+
+def _single(counts, title, xlabel, labels=None, small_ticks=False):
+    sns.set(style="whitegrid")
+    fig, ax = plt.subplots()
+    _bar(ax, counts, title, xlabel, labels=labels)
+    if small_ticks:
+        ax.tick_params(axis='x', labelsize=8)
+    _annotate(ax)
+    return fig
+
+
+def _pair(police, impacted, titles, xlabel, labels):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, counts, title in zip(axes, (police, impacted), titles):
+        _bar(ax, counts, title, xlabel, labels=labels)
+        _annotate(ax)
+    fig.tight_layout()
+    return fig
+
+
+def figure_1(df):
+    return _single(df['Penalty_binary'].value_counts().sort_index(),
+                   'Figure 1: Distribution of Penalty Outcomes (binary)', 'Penalty Outcome',
+                   labels=['No Penalty', 'Penalty'])
+
+
+def figure_2(df):
+    return _single(df['Penalty_categories'].value_counts(),
+                   'Figure 2: Types of Penalty Outcomes', 'Penalty Types', small_ticks=True)
+
+
+def figure_3(df):
+    return _pair(df['Police_sex_male'].value_counts().sort_index(),
+                 df['Impacted_sex_male'].value_counts().sort_index(),
+                 ['Figure 3-1: Police Sex Distribution', 'Figure 3-2: Impacted Persons Sex Distribution'],
+                 'Sex', ['Female', 'Male'])
+
+
+def figure_4(df):
+    return _pair(df['Police_race_white'].value_counts().sort_index(),
+                 df['Impacted_race_white'].value_counts().sort_index(),
+                 ['Figure 4-1: Police Race Distribution', 'Figure 4-2: Impacted Persons Race Distribution'],
+                 'Race', ['non-White', 'White'])
+
+
+def figure_5(df):
+    bins = range(0, 110, 10)  # Defines bins from 0 to 100 by 10s
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.histplot(df['Impacted_age_recoded'], bins=bins, kde=False, color='skyblue', ax=ax)
+    ax.set_title('Figure 5: Impacted Persons\' Ages')
+    ax.set_xlabel('Age Group')
+    ax.set_ylabel('Frequency')
+    ax.grid(axis='x')
+    ax.set_xticks([(a + b) / 2 for a, b in zip(bins[:-1], bins[1:])],
+                  labels=[f"{a}-{b - 1}" for a, b in zip(bins[:-1], bins[1:])])
+    return fig
+
+
+def figure_6(df):
+    return _single(df['Police_rank_mangerial'].value_counts().sort_index(),
+                   'Figure 6: Distribution of Officers Ranks', 'Penalty Outcome',
+                   labels=['Non-mangerial', 'Mangerial'])
+
+
+def figure_7(df):
+    return _single(df['FADO_recoded'].value_counts(),
+                   'Figure 7: Distribution of Allegation types', 'Allegation types', small_ticks=True)
+
+
+def figure_8(df):
+    return _single(df['Sex_mismatch'].value_counts().sort_index(),
+                   'Figure 8: Distribution of Sex Alignment/Mismatch', 'Outcome',
+                   labels=['Sex Alignment', 'Sex mismatch'])
+
+
+def figure_9(df):
+    return _single(df['Race_mismatch'].value_counts().sort_index(),
+                   'Figure 9: Distribution of Race Alignment/Mismatch', 'Outcome',
+                   labels=['Race Alignment', 'Race mismatch'])
+
+
+def figure_10(df):
+    year_counts = df['IncidentYear'].dropna().value_counts().sort_index()
+    fig, ax = plt.subplots(figsize=(14, 6))
+    _bar(ax, year_counts, 'Figure 10: Complaints by Year', 'Year', ylabel='Number of Complaints')
+    ax.tick_params(axis='x', rotation=45)
+    return fig
+
+
+FIGURES = {
+    1: figure_1, 2: figure_2, 3: figure_3, 4: figure_4, 5: figure_5,
+    6: figure_6, 7: figure_7, 8: figure_8, 9: figure_9, 10: figure_10,
+}
@@ -0,0 +1,381 @@
+"""Multinomial and ordinal logit for the discipline type of Section 4-2.
+
+Section 4-2 classifies ``Penalty_categories`` with decision trees only.
+``MultinomialLogit`` fits the same outcome by maximum likelihood, either as a
+multinomial logit (one equation per category against
+``Instructions and trainings``) or as an ordinal (proportional odds) logit
+that uses the order of severity::
+
+    P(category <= j) = 1 / (1 + exp(-(threshold_j - x b)))
+
+so a positive coefficient moves an allegation towards charges and
+specifications.
+
+* The fit is Newton-Raphson with step halving.  The gradient and Hessian are
+  analytic and computed over batches of rows with matrix products, so memory
+  stays bounded at full data size.
+* Rows are frequency-weighted: identical rows (same features and outcome)
+  are collapsed into one with their count before fitting, which shrinks the
+  data a lot when the features are binary.
+* Standard errors are sandwich-robust (``HC1`` by default; ``HC0`` or
+  ``nonrobust`` on request).
+
+``fit_multinomial_specifications`` fits a batch of formulas (the syntax of
+``specifications``) in parallel worker processes, and ``benchmark`` compares
+both models with the tree of Section 4-2 on fit time and held-out accuracy
+and log-loss.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ._shared import worker_pool
+from .columns import BASE_FEATURES
+from .specifications import CONSTANT, build_design
+from .trees import tree_params as default_tree_params
+
+# Least to most severe
+SEVERITY = ['Instructions and trainings', 'Command discipline', 'Charges and specifications']
+MODELS = ('multinomial', 'ordinal')
+COV_TYPES = ('nonrobust', 'HC0', 'HC1')
+BATCH_SIZE = 50_000
+
+# State of a specification worker (set once per worker)
+_worker = {}
+
+
+def collapse(X, codes, weights=None):
+    """Merge identical rows of ``X`` with the same outcome code.
+
+    Returns the distinct rows, their codes and their total weights (counts if
+    ``weights`` is None).
+    """
+    frame = pd.DataFrame(X)
+    frame['_code'] = codes
+    frame['_weight'] = 1.0 if weights is None else weights
+    grouped = frame.groupby(list(frame.columns[:-1]), sort=False)['_weight'].sum()
+    keys = grouped.index.to_frame(index=False).to_numpy()
+    return keys[:, :-1].astype(float), keys[:, -1].astype(np.int64), grouped.to_numpy(dtype=float)
+
+
+def _multinomial_batch(params, X, codes, weights, n_categories):
+    # Log-likelihood, per-row scores and Hessian of a batch of rows
+    B = params.reshape(n_categories - 1, X.shape[1])
+    eta = np.column_stack([np.zeros(len(X)), X @ B.T])
+    eta -= eta.max(axis=1, keepdims=True)
+    P = np.exp(eta)
+    P /= P.sum(axis=1, keepdims=True)
+    rows = np.arange(len(X))
+    loglik = weights @ np.log(np.maximum(P[rows, codes], 1e-300))
+
+    residual = -P[:, 1:]
+    observed = codes > 0
+    residual[observed, codes[observed] - 1] += 1
+    scores = (residual[:, :, None] * X[:, None, :]).reshape(len(X), -1)
+
+    k = X.shape[1]
+    hessian = np.empty((len(params), len(params)))
+    for a in range(n_categories - 1):
+        for b in range(a, n_categories - 1):
+            curvature = weights * P[:, a + 1] * ((a == b) - P[:, b + 1])
+            block = -(X * curvature[:, None]).T @ X
+            hessian[a * k:(a + 1) * k, b * k:(b + 1) * k] = block
+            hessian[b * k:(b + 1) * k, a * k:(a + 1) * k] = block.T
+    return loglik, scores, hessian
+
+
+def _ordinal_batch(params, X, codes, weights, n_categories):
+    from scipy.special import expit
+
+    thresholds, beta = params[:n_categories - 1], params[n_categories - 1:]
+    eta = X @ beta
+    # The observed category lies between the thresholds below and above it
+    F_upper = expit(np.append(thresholds, np.inf)[codes] - eta)
+    F_lower = expit(np.insert(thresholds, 0, -np.inf)[codes] - eta)
+    p = np.maximum(F_upper - F_lower, 1e-300)
+    f_upper, f_lower = F_upper * (1 - F_upper), F_lower * (1 - F_lower)
+    loglik = weights @ np.log(p)
+
+    # d(upper or lower index) / d(params)
+    indicators = np.eye(n_categories)[codes]
+    J_upper = np.column_stack([indicators[:, :-1], -X])
+    J_lower = np.column_stack([indicators[:, 1:], -X])
+    g_upper, g_lower = f_upper / p, -f_lower / p
+    scores = J_upper * g_upper[:, None] + J_lower * g_lower[:, None]
+
+    h_upper = f_upper * (1 - 2 * F_upper) / p - g_upper ** 2
+    h_lower = -f_lower * (1 - 2 * F_lower) / p - g_lower ** 2
+    h_cross = weights * -g_upper * g_lower
+    cross = (J_upper * h_cross[:, None]).T @ J_lower
+    hessian = ((J_upper * (weights * h_upper)[:, None]).T @ J_upper
+               + (J_lower * (weights * h_lower)[:, None]).T @ J_lower + cross + cross.T)
+    return loglik, scores, hessian
+
+
+BATCHES = {'multinomial': _multinomial_batch, 'ordinal': _ordinal_batch}
+
+
+def _derivatives(model, params, X, codes, weights, n_categories, batch_size, meat=False):
+    """Log-likelihood, gradient and Hessian, accumulated over batches of rows.
+
+    With ``meat``, also the sum of the weighted outer products of the scores.
+    """
+    loglik, gradient = 0.0, np.zeros(len(params))
+    hessian = np.zeros((len(params), len(params)))
+    outer = np.zeros_like(hessian) if meat else None
+    for start in range(0, len(X), batch_size):
+        batch = slice(start, start + batch_size)
+        value, scores, curvature = BATCHES[model](params, X[batch], codes[batch], weights[batch],
+                                                  n_categories)
+        loglik += value
+        gradient += scores.T @ weights[batch]
+        hessian += curvature
+        if meat:
+            outer += (scores * weights[batch][:, None]).T @ scores
+    return loglik, gradient, hessian, outer
+
+
+class MultinomialLogit:
+    """Multinomial or ordinal logit with the fit/predict interface of scikit-learn.
+
+    ``categories`` fixes the order of the outcome categories: the first one
+    is the reference of the multinomial logit, and the ordinal logit reads
+    them from least to most severe.  By default they are the categories of
+    ``SEVERITY``, followed by any others for the multinomial logit only (such
+    as the ``'Unspecified'`` penalties).  Rows whose outcome is not in
+    ``categories`` are dropped.
+    """
+
+    def __init__(self, model='multinomial', categories=None, fit_intercept=True, cov_type='HC1',
+                 collapse=True, tol=1e-8, max_iter=50, batch_size=BATCH_SIZE):
+        if model not in MODELS:
+            raise ValueError(f"model must be one of {MODELS}, got {model!r}")
+        if cov_type not in COV_TYPES:
+            raise ValueError(f"cov_type must be one of {COV_TYPES}, got {cov_type!r}")
+        self.model = model
+        self.categories = categories
+        self.fit_intercept = fit_intercept
+        self.cov_type = cov_type
+        self.collapse = collapse
+        self.tol = tol
+        self.max_iter = max_iter
+        self.batch_size = batch_size
+
+    def _design(self, X):
+        X = np.asarray(X, dtype=float)
+        if self.model == 'multinomial' and self.fit_intercept:
+            X = np.column_stack([np.ones(len(X)), X])
+        return X
+
+    def _start(self, codes, weights, n_features):
+        n_categories = len(self.classes_)
+        if self.model == 'multinomial':
+            return np.zeros((n_categories - 1) * n_features)
+        # Thresholds at the observed cumulative shares, slopes at zero
+        shares = np.bincount(codes, weights=weights, minlength=n_categories).cumsum()[:-1] / weights.sum()
+        shares = np.clip(shares, 1e-6, 1 - 1e-6)
+        return np.concatenate([np.log(shares / (1 - shares)), np.zeros(n_features)])
+
+    def _valid(self, params):
+        thresholds = params[:len(self.classes_) - 1]
+        return self.model != 'ordinal' or bool(np.all(np.diff(thresholds) > 0))
+
+    def fit(self, X, y, sample_weight=None):
+        """Fit by Newton-Raphson; ``sample_weight`` are frequency weights."""
+        self.feature_names_ = [str(name) for name in getattr(X, 'columns', range(np.shape(X)[1]))]
+        y = pd.Series(np.asarray(y))
+        if self.categories is not None:
+            categories = list(self.categories)
+        else:
+            present = set(y.dropna())
+            categories = [category for category in SEVERITY if category in present]
+            if self.model == 'multinomial':
+                categories += sorted(present - set(SEVERITY), key=str)
+        self.classes_ = np.array(categories, dtype=object)
+        keep = y.isin(categories).to_numpy()
+        codes = pd.Categorical(y[keep], categories=categories).codes.astype(np.int64)
+        X = self._design(X)[keep]
+        weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=float)[keep]
+        if self.collapse:
+            X, codes, weights = collapse(X, codes, weights)
+        self.n_rows_ = len(X)
+
+        n_categories = len(categories)
+        args = (X, codes, weights, n_categories, self.batch_size)
+        params = self._start(codes, weights, X.shape[1])
+        loglik, gradient, hessian, _ = _derivatives(self.model, params, *args)
+        self.converged_, self.n_iter_ = False, 0
+        for iteration in range(1, self.max_iter + 1):
+            step = np.linalg.lstsq(-hessian, gradient, rcond=None)[0]
+            scale = 1.0
+            while scale > 1e-10:
+                candidate = params + scale * step
+                if self._valid(candidate):
+                    new = _derivatives(self.model, candidate, *args)
+                    if new[0] >= loglik - 1e-12 * abs(loglik):
+                        break
+                scale /= 2
+            else:
+                break  # no step along the Newton direction improves the likelihood
+            params, (loglik, gradient, hessian, _) = candidate, new
+            self.n_iter_ = iteration
+            if np.max(np.abs(scale * step)) < self.tol:
+                self.converged_ = True
+                break
+
+        loglik, gradient, hessian, meat = _derivatives(self.model, params, *args, meat=True)
+        bread = np.linalg.pinv(-hessian)
+        nobs = weights.sum()
+        if self.cov_type == 'nonrobust':
+            covariance = bread
+        else:
+            covariance = bread @ meat @ bread
+            if self.cov_type == 'HC1':
+                covariance *= nobs / (nobs - len(params))
+        self.params_, self.cov_params_ = params, covariance
+        self.loglik_, self.nobs_ = loglik, nobs
+        return self
+
+    def predict_proba(self, X):
+        from scipy.special import expit
+
+        X = self._design(X)
+        n_categories = len(self.classes_)
+        if self.model == 'multinomial':
+            eta = np.column_stack([np.zeros(len(X)), X @ self.params_.reshape(n_categories - 1, -1).T])
+            eta -= eta.max(axis=1, keepdims=True)
+            P = np.exp(eta)
+            return P / P.sum(axis=1, keepdims=True)
+        thresholds = self.params_[:n_categories - 1]
+        cumulative = expit(thresholds[None, :] - (X @ self.params_[n_categories - 1:])[:, None])
+        return np.diff(np.column_stack([np.zeros(len(X)), cumulative, np.ones(len(X))]), axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def term_names(self):
+        """``(equation, term)`` of every parameter."""
+        features = ([CONSTANT] if self.fit_intercept else []) + self.feature_names_
+        classes = [str(category) for category in self.classes_]
+        if self.model == 'multinomial':
+            return [(category, term) for category in classes[1:] for term in features]
+        thresholds = [('threshold', f'{lower}|{upper}') for lower, upper in zip(classes, classes[1:])]
+        return thresholds + [('severity', term) for term in self.feature_names_]
+
+    def summary(self, alpha=0.05):
+        """Tidy coefficient table with z-statistics and confidence intervals."""
+        from scipy import stats
+
+        std_err = np.sqrt(np.diag(self.cov_params_))
+        statistic = self.params_ / std_err
+        critical = stats.norm.ppf(1 - alpha / 2)
+        equations, terms = zip(*self.term_names())
+        return pd.DataFrame({
+            'equation': equations,
+            'term': terms,
+            'coef': self.params_,
+            'std_err': std_err,
+            'statistic': statistic,
+            'p_value': 2 * stats.norm.sf(np.abs(statistic)),
+            'ci_lower': self.params_ - critical * std_err,
+            'ci_upper': self.params_ + critical * std_err,
+        })
+
+
+def _setup(X, y, names, settings):
+    _worker.update(X=X, y=y, names=names, settings=settings)
+
+
+def _fit_specification(columns):
+    names = _worker['names']
+    features = [column for column in columns if column != CONSTANT]
+    X = pd.DataFrame(_worker['X'][:, [names.index(column) for column in features]], columns=features)
+    model = MultinomialLogit(fit_intercept=CONSTANT in columns, **_worker['settings'])
+    start = time.perf_counter()
+    model.fit(X, _worker['y'])
+    table = model.summary()
+    table.attrs.update(nobs=int(model.nobs_), rows=model.n_rows_, loglik=model.loglik_,
+                       converged=model.converged_, iterations=model.n_iter_,
+                       fit_seconds=time.perf_counter() - start)
+    return table
+
+
+def fit_multinomial_specifications(df, formulas, model='multinomial', cov_type='HC1', max_workers=None,
+                                   **options):
+    """Fit every formula in ``formulas`` and return one tidy coefficient table.
+
+    ``formulas`` use the syntax of ``fit_specifications`` (a list of strings
+    or a dict from label to formula) with ``Penalty_categories`` as the
+    outcome; the ordinal logit ignores the constant.  The specifications are
+    fitted in parallel across ``max_workers`` processes that share one copy
+    of the design matrix; ``1`` fits them in this process.  Extra keyword
+    arguments go to ``MultinomialLogit``.
+    """
+    if isinstance(formulas, dict):
+        labels, formulas = list(formulas), list(formulas.values())
+    else:
+        formulas = list(formulas)
+        labels = list(formulas)
+
+    y, X, specs, _ = build_design(df, formulas)
+    settings = dict(model=model, cov_type=cov_type, **options)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(specs))
+    with worker_pool(_worker, _setup, (X.to_numpy(dtype=float),), (y.to_numpy(), list(X.columns), settings),
+                     max_workers) as pool:
+        fits = list(pool.map(_fit_specification, specs))
+
+    tables = []
+    for label, formula, table in zip(labels, formulas, fits):
+        tables.append(table.assign(specification=label, formula=formula, **table.attrs))
+    columns = ['specification', 'formula'] + list(fits[0].columns) + list(fits[0].attrs)
+    return pd.concat(tables, ignore_index=True)[columns]
+
+
+def benchmark(df, features=BASE_FEATURES, categories=SEVERITY, test_size=0.3, random_state=676,
+              tree_params=None):
+    """Compare the tree of Section 4-2 with both logits on one train/test split.
+
+    All three models use ``features`` and the rows of ``df`` whose
+    ``Penalty_categories`` is in ``categories``; the split is the one of
+    Section 4-2.  Returns one row per model with the fit time, the number of
+    parameters (leaves for the tree), and the held-out accuracy and log-loss.
+    """
+    from sklearn.metrics import accuracy_score, log_loss
+    from sklearn.model_selection import train_test_split
+    from sklearn.tree import DecisionTreeClassifier
+
+    data = df[df['Penalty_categories'].isin(categories)]
+    X, y = data[list(features)], data['Penalty_categories'].astype(str)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size,
+                                                        random_state=random_state)
+    if tree_params is None:
+        tree_params = default_tree_params('IncidentYear' in features)
+    candidates = {
+        'tree': DecisionTreeClassifier(**tree_params),
+        'multinomial': MultinomialLogit('multinomial', categories=categories),
+        'ordinal': MultinomialLogit('ordinal', categories=categories),
+    }
+    rows = []
+    for name, model in candidates.items():
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        seconds = time.perf_counter() - start
+        # log_loss expects the columns in sorted label order
+        probabilities = pd.DataFrame(model.predict_proba(X_test), columns=model.classes_)
+        size = model.get_n_leaves() if name == 'tree' else len(model.params_)
+        rows.append({
+            'model': name,
+            'fit_seconds': seconds,
+            'parameters': size,
+            'accuracy': accuracy_score(y_test, model.predict(X_test)),
+            'log_loss': log_loss(y_test, probabilities[sorted(model.classes_)], labels=sorted(model.classes_)),
+        })
+    table = pd.DataFrame(rows)
+    table.attrs.update(nobs_train=len(X_train), nobs_test=len(X_test))
+    return table
@@ -0,0 +1,291 @@
+"""Regularized logit over interaction terms built on the fly.
+
+Interactions such as race mismatch x allegation type x rank x year add
+hundreds of columns, and a dense design matrix of them would not fit in
+memory at full data size.  The factors involved are compact codes (binary
+recodes, four allegation types, 23 years), so every row has at most one
+active column per combination of factors.  ``interaction_design`` uses that
+to write the interaction columns straight into a sparse CSR matrix.
+
+``regularized_logit`` fits an L1 / elastic-net logistic regression of
+``Penalty_binary`` on those columns along a whole regularization path:
+
+    mean log-loss + lambda * (l1_ratio * |b|_1 + (1 - l1_ratio) / 2 * |b|_2^2)
+
+Identical rows are first collapsed into one with a frequency weight (with
+age as the only numeric column, a few tens of thousands of distinct rows
+remain).  Each path is solved by accelerated proximal gradient (FISTA),
+warm-started from the previous lambda.  The cross-validation folds and the
+full-data path of every ``l1_ratio`` run in parallel worker processes that
+share one copy of the sparse matrix; a fold only changes the weights, so no
+worker copies rows.  The penalty is chosen by cross-validated deviance, and the
+terms with non-zero coefficients are the selected interactions.
+"""
+
+import itertools
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ._shared import worker_pool
+
+# Factor -> reference level
+FACTORS = {
+    'Race_mismatch': 0.0,
+    'FADO_recoded': 'Abuse of authority',
+    'Police_rank_mangerial': 0.0,
+    'IncidentYear': 2000.0,
+}
+
+# State of a path worker (set once per worker)
+_worker = {}
+
+
+def interaction_design(df, factors=FACTORS, numeric=(), max_order=None, weights=None):
+    """Sparse design matrix of every interaction of ``factors``.
+
+    ``factors`` maps each column to its reference level; the other levels
+    get indicator columns, and every combination of up to ``max_order``
+    factors (all of them by default) gets one column per combination of
+    non-reference levels.  ``numeric`` columns are added as main effects,
+    standardized with the frequency ``weights`` of the rows if given.
+    ``df`` must not have missing values in these columns.
+
+    Returns the CSR matrix, the column names, and the means and standard
+    deviations used for ``numeric`` (zero and one for the indicators).
+    """
+    from scipy import sparse
+
+    names = list(factors)
+    max_order = max_order or len(names)
+    codes, labels = [], []
+    for name in names:
+        levels = sorted(pd.unique(df[name]))
+        reference = factors[name]
+        others = [level for level in levels if level != reference]
+        lookup = {level: position + 1 for position, level in enumerate(others)}
+        codes.append(df[name].map(lookup).fillna(0).to_numpy(dtype=np.int64))
+        binary = set(levels) <= {0, 1} and reference == 0
+        labels.append([name if binary else f'{name}[{level}]' for level in others])
+
+    rows, cols, columns = [], [], []
+    n = len(df)
+    for order in range(1, max_order + 1):
+        for subset in itertools.combinations(range(len(names)), order):
+            shape = tuple(len(labels[i]) for i in subset)
+            if not all(shape):
+                continue
+            active = np.all([codes[i] > 0 for i in subset], axis=0)
+            index = np.ravel_multi_index([codes[i][active] - 1 for i in subset], shape)
+            rows.append(np.flatnonzero(active))
+            cols.append(len(columns) + index)
+            columns.extend(':'.join(combo) for combo in itertools.product(*(labels[i] for i in subset)))
+    values = [np.ones(sum(len(r) for r in rows))]
+
+    means, scales = np.zeros(len(columns)), np.ones(len(columns))
+    for name in numeric:
+        column = df[name].to_numpy(dtype=float)
+        mean = np.average(column, weights=weights)
+        means = np.append(means, mean)
+        scales = np.append(scales, np.sqrt(np.average((column - mean) ** 2, weights=weights)) or 1.0)
+        rows.append(np.arange(n))
+        cols.append(np.full(n, len(columns)))
+        values.append((column - means[-1]) / scales[-1])
+        columns.append(name)
+
+    X = sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(n, len(columns)))
+    return X, columns, means, scales
+
+
+def _spectral_norm(X, weights, iterations=50, seed=0):
+    # Largest singular value of diag(sqrt(weights)) [1, X] by power iteration
+    v = np.random.default_rng(seed).normal(size=X.shape[1] + 1)
+    norm = 0.0
+    for _ in range(iterations):
+        u = weights * (X @ v[1:] + v[0])
+        w = np.concatenate([[u.sum()], X.T @ u])
+        norm = np.linalg.norm(w)
+        v = w / norm
+    return np.sqrt(norm)
+
+
+def _log_loss(eta, y, weights):
+    return np.sum(weights * (np.logaddexp(0, eta) - y * eta)) / weights.sum()
+
+
+def _fista(X, y, weights, lam, l1_ratio, intercept, beta, step, tol, max_iter):
+    """Minimize the penalized weighted log-loss for one ``lam``, from ``beta``.
+
+    Returns the intercept, the coefficients and whether they converged
+    within ``max_iter`` iterations.
+    """
+    total = weights.sum()
+    l1, l2 = lam * l1_ratio, lam * (1 - l1_ratio)
+
+    def objective(point, eta):
+        return (_log_loss(eta, y, weights) + l1 * np.abs(point[1:]).sum()
+                + l2 / 2 * point[1:] @ point[1:])
+
+    # The linear predictors are carried along with the points, so each
+    # iteration costs one product with X and one with X.T
+    current = np.concatenate([[intercept], beta])
+    eta_current = X @ beta + intercept
+    momentum, eta_momentum, t = current, eta_current, 1.0
+    previous_objective = objective(current, eta_current)
+    restarted = False
+    for _ in range(max_iter):
+        residual = weights * (1 / (1 + np.exp(-eta_momentum)) - y) / total
+        gradient = np.concatenate([[residual.sum()], X.T @ residual])
+        candidate = momentum - step * gradient
+        # Proximal step of the elastic net; the intercept is not penalized.  At
+        # lambda_max the gradient equals the threshold, so shrinkage within
+        # rounding of it is zero rather than a coefficient of 1e-17.
+        shrunk = np.abs(candidate[1:]) - step * l1
+        shrunk[shrunk <= 1e-12 * step * l1] = 0
+        candidate[1:] = np.sign(candidate[1:]) * shrunk / (1 + step * l2)
+        eta_candidate = X @ candidate[1:] + candidate[0]
+        candidate_objective = objective(candidate, eta_candidate)
+        if candidate_objective > previous_objective:
+            if restarted:
+                return current[0], current[1:], True  # not even a plain step improves: rounding
+            # Adaptive restart: drop the momentum and take a plain step instead
+            momentum, eta_momentum, t, restarted = current, eta_current, 1.0, True
+            continue
+        restarted = False
+        change = np.max(np.abs(candidate - current))
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        factor = (t - 1) / t_next
+        momentum = candidate + factor * (candidate - current)
+        eta_momentum = eta_candidate + factor * (eta_candidate - eta_current)
+        current, eta_current, t, previous_objective = candidate, eta_candidate, t_next, candidate_objective
+        if change < tol:
+            return current[0], current[1:], True
+    return current[0], current[1:], False
+
+
+def lambda_path(X, y, l1_ratio, n_lambdas=50, lambda_min_ratio=1e-3, weights=None):
+    """Decreasing penalties from the smallest one that zeroes every coefficient."""
+    weights = np.ones(len(y)) if weights is None else weights
+    rate = np.average(y, weights=weights)
+    lambda_max = np.max(np.abs(X.T @ (weights * (y - rate)))) / weights.sum() / l1_ratio
+    return lambda_max * np.logspace(0, np.log10(lambda_min_ratio), n_lambdas)
+
+
+def _setup(data, indices, indptr, shape, y, settings):
+    from scipy import sparse
+
+    X = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+    _worker.update(X=X, y=y, **settings)
+
+
+def _solve_path(l1_ratio, lambdas, fold):
+    """Fit the whole path on all rows but ``fold`` (all rows if ``fold`` is None).
+
+    Returns the coefficients along the path, whether each converged and,
+    for a fold, the held-out deviance at each lambda.
+    """
+    X, y, counts = _worker['X'], _worker['y'], _worker['counts']
+    weights = counts.sum(axis=1)
+    train = weights if fold is None else weights - counts[:, fold]
+    # 1 / Lipschitz constant of the gradient (largest lambda for the L2 part)
+    step = 1 / (_worker['norm'] ** 2 / (4 * train.sum()) + lambdas[0] * (1 - l1_ratio))
+    rate = np.average(y, weights=train)
+    intercept = np.log(rate / (1 - rate))
+    beta = np.zeros(X.shape[1])
+    coefs, converged, deviance = [], [], []
+    for lam in lambdas:
+        intercept, beta, done = _fista(X, y, train, lam, l1_ratio, intercept, beta, step,
+                                       _worker['tol'], _worker['max_iter'])
+        coefs.append(np.concatenate([[intercept], beta]))
+        converged.append(done)
+        if fold is not None:
+            deviance.append(2 * _log_loss(X @ beta + intercept, y, counts[:, fold]))
+    return np.array(coefs), np.array(converged), np.array(deviance)
+
+
+def regularized_logit(df, factors=FACTORS, numeric=('Impacted_age_recoded',), outcome='Penalty_binary',
+                      l1_ratios=(1.0,), n_lambdas=50, lambda_min_ratio=1e-3, cv=5, rule='min',
+                      max_order=None, max_workers=None, seed=676, tol=1e-6, max_iter=2000):
+    """Cross-validated elastic-net logit of ``outcome`` on interactions of ``factors``.
+
+    ``l1_ratios`` are the mixing values to try (1 is the lasso; each must be
+    above 0).  ``rule`` picks the penalty with the lowest cross-validated
+    deviance (``'min'``) or the largest one within one standard error of it
+    (``'1se'``).  Rows missing any of the columns are dropped.  The folds run
+    in ``max_workers`` processes; ``1`` fits everything in this process.
+
+    Returns two DataFrames: the coefficient of every term at the chosen
+    penalty (``selected`` marks the non-zero ones, ``order`` the number of
+    factors in the term), and the path with the cross-validated deviance,
+    number of non-zero terms and convergence of the fits at each penalty.
+    Penalties where the full fit or a fold ran out of ``max_iter`` iterations
+    are also reported with a warning.
+    """
+    l1_ratios = [float(ratio) for ratio in l1_ratios]
+    if not all(0 < ratio <= 1 for ratio in l1_ratios):
+        raise ValueError("l1_ratios must be in (0, 1]")
+    if rule not in ('min', '1se'):
+        raise ValueError(f"rule must be 'min' or '1se', got {rule!r}")
+
+    data = df[[outcome] + list(factors) + list(numeric)].dropna()
+    folds = np.random.default_rng(seed).permutation(len(data)) % cv
+    # Identical rows are collapsed into one, with its count in every fold
+    counts = (data.assign(_fold=folds)
+              .groupby(list(data.columns) + ['_fold'], sort=False).size()
+              .unstack('_fold', fill_value=0).reindex(columns=range(cv), fill_value=0))
+    rows = counts.index.to_frame(index=False)
+    counts = counts.to_numpy(dtype=float)
+    weights = counts.sum(axis=1)
+    X, columns, means, scales = interaction_design(rows, factors, numeric, max_order, weights)
+    y = rows[outcome].to_numpy(dtype=float)
+    paths = {ratio: lambda_path(X, y, ratio, n_lambdas, lambda_min_ratio, weights) for ratio in l1_ratios}
+    settings = dict(counts=counts, norm=_spectral_norm(X, weights), tol=tol, max_iter=max_iter)
+
+    tasks = [(ratio, fold) for ratio in l1_ratios for fold in [None] + list(range(cv))]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    with worker_pool(_worker, _setup, (X.data, X.indices, X.indptr), (X.shape, y, settings),
+                     max_workers) as pool:
+        jobs = {task: pool.submit(_solve_path, task[0], paths[task[0]], task[1]) for task in tasks}
+        results = {task: job.result() for task, job in jobs.items()}
+
+    path_tables = []
+    for ratio in l1_ratios:
+        coefs = results[(ratio, None)][0]
+        deviance = np.array([results[(ratio, fold)][2] for fold in range(cv)])
+        converged = np.all([results[(ratio, fold)][1] for fold in [None] + list(range(cv))], axis=0)
+        path_tables.append(pd.DataFrame({
+            'l1_ratio': ratio,
+            'lambda': paths[ratio],
+            'cv_deviance': deviance.mean(axis=0),
+            'cv_se': deviance.std(axis=0, ddof=1) / np.sqrt(cv),
+            'n_nonzero': (coefs[:, 1:] != 0).sum(axis=1),
+            'converged': converged,
+        }))
+    path = pd.concat(path_tables, ignore_index=True)
+    if not path['converged'].all():
+        warnings.warn(f"regularized_logit: {(~path['converged']).sum()} of {len(path)} penalties did not "
+                      f"converge in max_iter={max_iter} iterations", RuntimeWarning, stacklevel=2)
+
+    best = path['cv_deviance'].idxmin()
+    if rule == '1se':
+        threshold = path.loc[best, 'cv_deviance'] + path.loc[best, 'cv_se']
+        within = path[(path['l1_ratio'] == path.loc[best, 'l1_ratio']) & (path['cv_deviance'] <= threshold)]
+        best = within['lambda'].idxmax()
+    path['chosen'] = path.index == best
+    ratio = path.loc[best, 'l1_ratio']
+    position = int(np.flatnonzero(paths[ratio] == path.loc[best, 'lambda'])[0])
+    coef = results[(ratio, None)][0][position]
+
+    # Back to the original scale of the numeric columns
+    beta = coef[1:] / scales
+    intercept = coef[0] - np.sum(beta * means)
+    terms = pd.DataFrame({
+        'term': ['const'] + columns,
+        'coef': np.concatenate([[intercept], beta]),
+        'order': [0] + [term.count(':') + 1 for term in columns],
+    })
+    terms['selected'] = (terms['coef'] != 0) & (terms['term'] != 'const')
+    return terms, path
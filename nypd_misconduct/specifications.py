@@ -0,0 +1,250 @@
+"""Batch fitting of nested regression specifications.
+
+Models 4-1-1 to 4-1-3 are nested: they share the same outcome and sample and
+only differ by which terms enter ``X``.  ``fit_specifications`` takes a list
+of formulas, builds one design matrix holding every term any of them needs,
+and fits the smallest specification first.  Every other specification is
+warm-started from it, so they can all be fitted at the same time.  The result
+is one tidy coefficient table, which is what a specification-curve plot wants
+as input.
+
+Formulas use a small R-like syntax::
+
+    Penalty_binary ~ Police_rank_mangerial + Race_mismatch + Year_*
+    Penalty_binary ~ Race_mismatch + Race_mismatch:FADO_Force - 1
+
+* ``+`` adds a term and ``-`` removes one (``- 1`` drops the constant);
+* ``a:b`` is the product of columns ``a`` and ``b``;
+* shell-style wildcards (``Year_*``, ``Year_201?.0``) expand to every matching
+  column, so sets of year dummies do not need to be spelled out.
+
+Column names may contain spaces (``FADO_Offensive language``).  A formula
+only chooses columns; to fit a specification on a year window or another
+subset of rows, give it a ``DataFrame.query`` string in ``subsets``.
+"""
+
+import fnmatch
+import itertools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from ._shared import worker_pool
+
+CONSTANT = 'const'
+FAMILIES = ('logit', 'lpm')
+
+# Design matrix of a specification worker (set once per worker)
+_worker = {}
+
+
+def _expand_factor(pattern, columns):
+    if any(char in pattern for char in '*?['):
+        matches = [column for column in columns if fnmatch.fnmatchcase(column, pattern)]
+    else:
+        matches = [pattern] if pattern in columns else []
+    if not matches:
+        raise KeyError(f"No column matches '{pattern}'")
+    return matches
+
+
+def parse_formula(formula, columns):
+    """Split ``formula`` into its outcome, terms and whether it has a constant.
+
+    Each term is a tuple of column names; main effects are 1-tuples and
+    interactions hold one name per factor.
+    """
+    if formula.count('~') != 1:
+        raise ValueError(f"Formula must contain exactly one '~': {formula!r}")
+    outcome, rhs = (part.strip() for part in formula.split('~'))
+    if outcome not in columns:
+        raise KeyError(f"Outcome '{outcome}' is not a column")
+
+    tokens = re.split(r'\s*([+-])\s*', rhs.strip())
+    signs = ['+'] + tokens[1::2]
+    terms, has_const = [], True
+    for sign, token in zip(signs, tokens[0::2]):
+        token = token.strip()
+        if not token:
+            continue
+        if token in ('0', '1'):
+            has_const = (sign == '+') == (token == '1')
+            continue
+        factors = [_expand_factor(factor.strip(), columns) for factor in token.split(':')]
+        expanded = [tuple(combo) for combo in itertools.product(*factors)]
+        for term in expanded:
+            if sign == '+' and term not in terms:
+                terms.append(term)
+            elif sign == '-' and term in terms:
+                terms.remove(term)
+    return outcome, terms, has_const
+
+
+def term_name(term):
+    return ':'.join(term)
+
+
+def build_design(df, formulas, subsets=None):
+    """Build the shared design matrix for ``formulas``.
+
+    Returns ``(y, X, specs, rows)`` where ``X`` holds the constant and every
+    term used by any formula, restricted to rows that are complete for all of
+    them, and ``specs`` lists the column names each formula selects from
+    ``X``.  ``subsets`` gives an optional ``df.query`` string per formula; the
+    matching positions of ``X`` are in ``rows`` (None for all rows).
+    """
+    columns = list(df.columns)
+    parsed = [parse_formula(formula, columns) for formula in formulas]
+    outcomes = {outcome for outcome, _, _ in parsed}
+    if len(outcomes) != 1:
+        raise ValueError(f"All specifications must share one outcome, got {sorted(outcomes)}")
+    outcome = outcomes.pop()
+
+    all_terms = list(dict.fromkeys(term for _, terms, _ in parsed for term in terms))
+    sources = list(dict.fromkeys(factor for term in all_terms for factor in term))
+    # One common sample so the specifications stay comparable
+    complete = df[[outcome] + sources].notna().all(axis=1).to_numpy()
+    data = df.loc[complete, [outcome] + sources]
+
+    X = pd.DataFrame({CONSTANT: np.ones(len(data))}, index=data.index)
+    for term in all_terms:
+        X[term_name(term)] = np.prod([data[factor].to_numpy(dtype=float) for factor in term], axis=0)
+
+    specs = []
+    for _, terms, has_const in parsed:
+        names = [term_name(term) for term in terms]
+        specs.append(([CONSTANT] if has_const else []) + names)
+
+    rows = []
+    for subset in subsets or [None] * len(formulas):
+        if subset is None:
+            rows.append(None)
+        else:
+            rows.append(np.flatnonzero(np.asarray(df.eval(subset), dtype=bool)[complete]))
+    return data[outcome], X, specs, rows
+
+
+def _assign_parents(specs):
+    """Pick the root specification to warm-start each one from.
+
+    Specifications are visited from smallest to largest.  The parent is the
+    root sharing the most terms with it (ties go to the one with fewer extra
+    terms, then to the earlier one); one that shares no term with any root
+    becomes a root itself.  Every specification is then at depth 0 or 1, so
+    all the non-roots can be fitted at once.  Returns parents and depths.
+    """
+    order = sorted(range(len(specs)), key=lambda i: (len(specs[i]), i))
+    parents, depths, roots = [None] * len(specs), [0] * len(specs), []
+    for i in order:
+        terms = set(specs[i])
+        best, best_key = None, (0, 0)
+        for j in roots:
+            shared = len(terms & set(specs[j]))
+            key = (shared, -len(set(specs[j]) - terms))
+            if shared and (best is None or key > best_key):
+                best, best_key = j, key
+        if best is None:
+            roots.append(i)
+        else:
+            parents[i], depths[i] = best, 1
+    return parents, depths
+
+
+def _setup(y, X, names):
+    _worker.update(y=y, X=X, names=names)
+
+
+def _fit_one(family, columns, rows, start_params, cov_type, fit_kwargs):
+    import statsmodels.api as sm
+
+    index = [_worker['names'].index(column) for column in columns]
+    X = _worker['X'][:, index]
+    y = _worker['y']
+    if rows is not None:
+        X, y = X[rows], y[rows]
+    if family == 'logit':
+        result = sm.Logit(y, X).fit(start_params=start_params, cov_type=cov_type,
+                                    disp=0, **fit_kwargs)
+        converged = bool(result.mle_retvals['converged'])
+        iterations = int(result.mle_retvals.get('iterations', -1))
+    else:
+        result = sm.OLS(y, X).fit(cov_type=cov_type)
+        converged, iterations = True, 0
+    conf_int = np.asarray(result.conf_int())
+    return {
+        'params': np.asarray(result.params), 'bse': np.asarray(result.bse),
+        'tvalues': np.asarray(result.tvalues), 'pvalues': np.asarray(result.pvalues),
+        'ci_lower': conf_int[:, 0], 'ci_upper': conf_int[:, 1],
+        'nobs': int(result.nobs), 'converged': converged, 'iterations': iterations,
+    }
+
+
+def fit_specifications(df, formulas, family='logit', cov_type='HC3', max_workers=None,
+                       subsets=None, **fit_kwargs):
+    """Fit every formula in ``formulas`` and return one tidy coefficient table.
+
+    ``formulas`` is a list of formula strings or a dict mapping a label to a
+    formula.  ``family`` is ``'logit'`` (``sm.Logit``) or ``'lpm'`` (``sm.OLS``,
+    the linear probability model).  Logit fits start from the parameters of the
+    smallest specification sharing terms with them (``warm_start_from``); that
+    one is fitted first and the others in parallel across ``max_workers``
+    processes sharing one copy of the design matrix (``1`` fits everything in
+    this process).  ``subsets`` maps a
+    label (or, for a list of formulas, the formula) to a ``df.query`` string
+    such as ``'IncidentYear >= 2010'`` that restricts that specification to
+    part of the common sample.  Extra keyword arguments are passed to
+    ``Logit.fit``.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"family must be one of {FAMILIES}, got {family!r}")
+    if isinstance(formulas, dict):
+        labels, formulas = list(formulas), list(formulas.values())
+    else:
+        formulas = list(formulas)
+        labels = list(formulas)
+
+    subsets = [(subsets or {}).get(label) for label in labels]
+    y, X, specs, rows = build_design(df, formulas, subsets)
+    parents, depths = _assign_parents(specs)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(specs))
+
+    fits = [None] * len(specs)
+
+    def start_params(i):
+        parent = parents[i]
+        if family != 'logit' or parent is None:
+            return None
+        previous = dict(zip(specs[parent], fits[parent]['params']))
+        return np.array([previous.get(column, 0.0) for column in specs[i]])
+
+    arrays = (y.to_numpy(dtype=float), X.to_numpy(dtype=float))
+    with worker_pool(_worker, _setup, arrays, (list(X.columns),), max_workers) as pool:
+        for depth in range(max(depths) + 1):
+            level = [i for i in range(len(specs)) if depths[i] == depth]
+            jobs = {i: pool.submit(_fit_one, family, specs[i], rows[i], start_params(i), cov_type,
+                                   fit_kwargs)
+                    for i in level}
+            for i, job in jobs.items():
+                fits[i] = job.result()
+
+    tables = []
+    for i, fit in enumerate(fits):
+        tables.append(pd.DataFrame({
+            'specification': labels[i],
+            'formula': formulas[i],
+            'subset': subsets[i],
+            'term': specs[i],
+            'coef': fit['params'],
+            'std_err': fit['bse'],
+            'statistic': fit['tvalues'],
+            'p_value': fit['pvalues'],
+            'ci_lower': fit['ci_lower'],
+            'ci_upper': fit['ci_upper'],
+            'nobs': fit['nobs'],
+            'converged': fit['converged'],
+            'iterations': fit['iterations'],
+            'warm_start_from': None if parents[i] is None else labels[parents[i]],
+        }))
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,258 @@
+"""SQL execution backend for the recoding steps of Section 3.
+
+The pandas path reads the whole CSV and recodes it row by row with
+``.apply``.  This module expresses the same recoding rules as SQL and runs
+them with DuckDB, an embedded (in-process, no server) columnar engine.  Only
+the raw columns a result needs are read, and the ``dropna`` filters run on
+the recoded columns right after the scan, before the dummies and mismatches
+are built.  On a synthetic 400,000-row export and one core, ``build_new_df``
+took 1.3 s from the CSV and 0.5 s from a Parquet copy, against 2.0 s and
+0.5 s for ``LazyFrame(...).model_frame()``; scaling with ``threads`` has not
+been measured.
+
+``build_new_df`` returns the same frame as the script's
+``new_df = df.filter([...]).dropna()`` (same columns, order, index and
+values); ``value_counts`` returns the counts behind the bar charts of
+Section 3.  DuckDB is only needed when these functions are called.
+"""
+
+from .columns import MODEL_COLUMNS, YEAR_DUMMIES
+from .derived import plan, raw_sources
+
+# Strings that pandas.read_csv turns into NaN by default
+PANDAS_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+]
+
+CHARGES_AND_SPECIFICATIONS = ['loss of vacation', 'resigned/retired', 'probation', 'suspension', 'termination']
+MANAGERIAL = ['Sergeant', 'Lieutenant', 'Captain', 'Deputy Inspector', 'Chiefs and other ranks']
+NON_MANAGERIAL = ['Police Officer', 'Detective']
+RACE_NA = ['Unknown', 'Refused', 'Decline to Answer (NA)']
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _contains_any(expression, needles):
+    return ' OR '.join(f'contains({expression}, {_literal(needle)})' for needle in needles)
+
+
+def _gender(column):
+    lowered = f'lower({column})'
+    return (f"CASE WHEN contains({lowered}, 'female') THEN 0 "
+            f"WHEN contains({lowered}, 'male') THEN 1 END")
+
+
+def _race(column):
+    return (f"CASE WHEN {column} IS NULL OR {_contains_any(column, RACE_NA)} THEN NULL "
+            f"WHEN contains({column}, 'White') THEN 1 ELSE 0 END")
+
+
+# Stage 1: recodes of the raw columns, mirroring the recoders in Section 3.
+# Missing text is matched as 'nan' because the penalty recoders call str() on
+# NaN before matching.
+_PENALTY = "lower(coalesce(PenaltyCat, 'nan'))"
+RECODES = {
+    'Penalty_binary': (f"CASE WHEN contains({_PENALTY}, 'pending') THEN NULL "
+                       f"WHEN contains({_PENALTY}, 'no discipline') THEN 0 ELSE 1 END"),
+    'Penalty_categories': (f"CASE WHEN contains({_PENALTY}, 'pending') "
+                           f"OR contains({_PENALTY}, 'no discipline') THEN NULL "
+                           f"WHEN contains({_PENALTY}, 'command discipline') THEN 'Command discipline' "
+                           f"WHEN contains({_PENALTY}, 'reprimand') THEN 'Instructions and trainings' "
+                           f"WHEN {_contains_any(_PENALTY, CHARGES_AND_SPECIFICATIONS)} "
+                           f"THEN 'Charges and specifications' ELSE 'Unspecified' END"),
+    'Impacted_sex_male': _gender('ImpactedGender'),
+    'Police_sex_male': _gender('OfficerGender'),
+    'Impacted_race_white': _race('ImpactedRace'),
+    'Police_race_white': _race('OfficerRace'),
+    'Impacted_age_recoded': ("CASE WHEN TRY_CAST(ImpactedAge AS DOUBLE) BETWEEN 10 AND 99 "
+                             "THEN TRY_CAST(ImpactedAge AS DOUBLE) END"),
+    'Police_rank_mangerial': (f"CASE WHEN {_contains_any('CurrentRankLong', MANAGERIAL)} THEN 1 "
+                              f"WHEN {_contains_any('CurrentRankLong', NON_MANAGERIAL)} THEN 0 END"),
+    'FADO_recoded': ("CASE WHEN contains(FADOType, 'Abuse') THEN 'Abuse of authority' "
+                     "WHEN contains(FADOType, 'Force') THEN 'Force' "
+                     "WHEN contains(FADOType, 'Discourtesy') THEN 'Discourtesy' "
+                     "WHEN contains(FADOType, 'Offensive') THEN 'Offensive language' END"),
+    # IncidentDate is already a timestamp (see ``_load``)
+    'IncidentYear': "CASE WHEN year(IncidentDate) BETWEEN 2000 AND 2022 THEN year(IncidentDate) END",
+}
+
+# Stage 2: variables built from the recodes.  Dummies are 0 (not missing) when
+# the recode is missing, exactly like pd.get_dummies.
+DERIVED = {
+    'FADO_Discourtesy': "CAST(FADO_recoded IS NOT DISTINCT FROM 'Discourtesy' AS BIGINT)",
+    'FADO_Force': "CAST(FADO_recoded IS NOT DISTINCT FROM 'Force' AS BIGINT)",
+    'FADO_Offensive language': "CAST(FADO_recoded IS NOT DISTINCT FROM 'Offensive language' AS BIGINT)",
+    'Sex_mismatch': 'CAST(Police_sex_male <> Impacted_sex_male AS DOUBLE)',
+    'Race_mismatch': 'CAST(Police_race_white <> Impacted_race_white AS DOUBLE)',
+}
+DERIVED.update({
+    dummy: f"CAST(IncidentYear IS NOT DISTINCT FROM {dummy[len('Year_'):-len('.0')]} AS BIGINT)"
+    for dummy in YEAR_DUMMIES
+})
+
+# pandas dtypes of the output: get_dummies gives ints, the recoders give floats
+STRING_COLUMNS = {'Penalty_categories', 'FADO_recoded'}
+INT_COLUMNS = {'FADO_Discourtesy', 'FADO_Force', 'FADO_Offensive language'} | set(YEAR_DUMMIES)
+
+
+def connect(threads=None):
+    """Open an in-memory DuckDB connection using ``threads`` worker threads."""
+    try:
+        import duckdb
+    except ImportError as error:
+        raise ImportError("The SQL backend needs DuckDB: pip install duckdb") from error
+    connection = duckdb.connect(database=':memory:')
+    if threads:
+        connection.execute(f'SET threads = {int(threads)}')
+    return connection
+
+
+def _is_parquet(source):
+    return str(source).lower().endswith('.parquet')
+
+
+def _scan(source, all_varchar=True):
+    path = _literal(str(source))
+    if _is_parquet(source):
+        return f'read_parquet({path})'
+    nulls = ', '.join(_literal(value) for value in PANDAS_NA_VALUES)
+    return (f'read_csv({path}, all_varchar = {str(all_varchar).lower()}, header = true, '
+            f'nullstr = [{nulls}])')
+
+
+def _raw_column(name, sql_type):
+    if name != 'IncidentDate':
+        return _quote(name)
+    if sql_type == 'VARCHAR':
+        # The export writes mm/dd/yyyy; ISO dates are what pandas would also parse
+        return ("coalesce(try_strptime(IncidentDate, '%m/%d/%Y'), TRY_CAST(IncidentDate AS TIMESTAMP)) "
+                "AS IncidentDate")
+    return 'TRY_CAST(IncidentDate AS TIMESTAMP) AS IncidentDate'
+
+
+def _load(connection, source, names):
+    """FROM item with the raw columns behind ``names`` and their row number.
+
+    ``__index__`` is the row number in the raw file, so results keep the
+    pandas index.  Parquet scans report it themselves; a CSV scan does not,
+    so the needed columns are first loaded into a table, whose ``rowid``
+    follows the order of the file.  ``IncidentDate`` is parsed into a
+    timestamp here, once, rather than in every year dummy built from it.
+    """
+    columns = raw_sources(names)
+    scan = _scan(source)
+    described = connection.execute(f'DESCRIBE SELECT {", ".join(map(_quote, columns))} FROM {scan}')
+    types = {row[0]: row[1] for row in described.fetchall()}
+    selected = ', '.join(_raw_column(column, types[column]) for column in columns)
+    if _is_parquet(source):
+        return (f'(SELECT file_row_number AS __index__, {selected} '
+                f'FROM read_parquet({_literal(str(source))}, file_row_number = true))')
+    connection.execute(f'CREATE TEMP TABLE raw AS SELECT {selected} FROM {scan}')
+    return '(SELECT rowid AS __index__, * FROM raw)'
+
+
+def _cast(name, expression):
+    if name in STRING_COLUMNS or name in INT_COLUMNS:
+        return expression
+    return f'CAST({expression} AS DOUBLE)'
+
+
+def _select(items):
+    return ',\n        '.join(f'{_cast(name, sql)} AS {_quote(name)}' for name, sql in items.items())
+
+
+def _recoded_relation(raw, names):
+    """SQL for the recoded and derived columns ``names`` need, one row per raw row."""
+    needed = plan(names)
+    recodes = {name: sql for name, sql in RECODES.items() if name in needed}
+    derived = {name: sql for name, sql in DERIVED.items() if name in needed}
+    return f"""
+WITH recoded AS (
+    SELECT __index__,
+        {_select(recodes)}
+    FROM {raw}
+)
+SELECT *{',' if derived else ''}
+    {_select(derived)}
+FROM recoded
+"""
+
+
+def recode_query(raw, outcome='Penalty_binary', columns=MODEL_COLUMNS):
+    """Return the SQL that builds ``new_df`` for ``outcome`` from ``raw``.
+
+    ``raw`` is the FROM item of the raw CSV or Parquet copy (see ``_load``).
+    Nothing before the ``ORDER BY`` needs the rows in order, so DuckDB moves
+    the ``dropna`` filters down to just above the scan.
+    """
+    selected = [outcome] + [column for column in columns if column != outcome]
+    output = ', '.join(_quote(column) for column in selected)
+    where = ' AND '.join(f'{_quote(column)} IS NOT NULL' for column in selected)
+    return f"""
+SELECT __index__, {output}
+FROM ({_recoded_relation(raw, selected)})
+WHERE {where}
+ORDER BY __index__
+"""
+
+
+def build_new_df(source, outcome='Penalty_binary', columns=MODEL_COLUMNS, threads=None):
+    """Build the modelling frame of Section 4 with SQL instead of pandas.
+
+    ``outcome`` is ``'Penalty_binary'`` (Section 4-1) or
+    ``'Penalty_categories'`` (Section 4-2).
+    """
+    connection = connect(threads)
+    try:
+        selected = [outcome] + list(columns)
+        frame = connection.execute(recode_query(_load(connection, source, selected), outcome, columns)).df()
+    finally:
+        connection.close()
+    frame = frame.set_index('__index__')
+    frame.index.name = None
+    for column in frame.columns:
+        if column in INT_COLUMNS:
+            frame[column] = frame[column].astype('int64')
+        elif column not in STRING_COLUMNS:
+            frame[column] = frame[column].astype('float64')
+    return frame
+
+
+def value_counts(source, column, threads=None):
+    """Count the levels of a recoded ``column``, like ``df[column].value_counts()``."""
+    if column not in RECODES and column not in DERIVED:
+        raise KeyError(f"'{column}' is not a recoded column")
+    connection = connect(threads)
+    try:
+        query = (f'SELECT {_quote(column)} AS level, count(*) AS count '
+                 f'FROM ({_recoded_relation(_load(connection, source, [column]), [column])}) '
+                 f'WHERE level IS NOT NULL GROUP BY level ORDER BY count DESC, level')
+        counts = connection.execute(query).df()
+    finally:
+        connection.close()
+    series = counts.set_index('level')['count']
+    series.index.name = column
+    series.name = 'count'
+    return series
+
+
+def to_parquet(source, destination, threads=None):
+    """Copy the raw CSV to Parquet so later scans only read the columns they use.
+
+    Column types are inferred from the CSV (ages are numbers, dates are
+    dates), so the copy also works as a source for ``LazyFrame``.
+    """
+    connection = connect(threads)
+    try:
+        connection.execute(f'COPY (SELECT * FROM {_scan(source, all_varchar=False)}) '
+                           f'TO {_literal(str(destination))} (FORMAT parquet)')
+    finally:
+        connection.close()
@@ -0,0 +1,160 @@
+"""Fast exports and permutation importance for the decision trees of Section 4-2.
+
+Figures 11 and 12 draw the fitted ``DecisionTreeClassifier`` with
+``plot_tree`` on a 60x20 inch canvas, which is slow and only readable as a
+picture.  ``export_tree`` writes the same tree as plain text, JSON and
+Graphviz DOT in milliseconds, and ``permutation_importance`` measures how
+much the held-out score drops when each feature is shuffled.
+
+The permutations run across a process pool.  ``X_test`` is placed once in
+shared memory, one feature per contiguous row, and every worker reads it
+from there instead of receiving its own pickled copy.  A worker only owns
+one column-sized buffer for the shuffled feature; the frame it scores is
+assembled from views of the shared columns.  The fitted model is sent once
+per worker.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from ._shared import worker_pool
+
+CLASS_NAMES = ['Charges', 'C-discipline', 'Instructions']
+
+# State of a permutation worker (set once per worker)
+_worker = {}
+
+
+def tree_params(years=False):
+    """``DecisionTreeClassifier`` parameters of the trees of Section 4-2.
+
+    The tree of 4-2-2, which also splits on ``IncidentYear``, allows smaller
+    leaves.
+    """
+    return dict(max_depth=4, random_state=676, min_samples_split=20,
+                min_samples_leaf=10 if years else 30, max_leaf_nodes=15)
+
+
+def class_labels(dtree, class_names=CLASS_NAMES):
+    """Class names for the plots and exports of ``dtree``.
+
+    Figures 11 and 12 label the three discipline types; the fitted labels are
+    used instead when the tree saw a different set of classes.
+    """
+    if class_names is None or len(class_names) != len(dtree.classes_):
+        return [str(label) for label in dtree.classes_]
+    return list(class_names)
+
+
+def tree_to_text(dtree, feature_names):
+    from sklearn.tree import export_text
+
+    return export_text(dtree, feature_names=list(feature_names), show_weights=True)
+
+
+def tree_to_dict(dtree, feature_names, class_names=None):
+    """Nested dict of the fitted tree: splits for internal nodes, counts for all."""
+    tree = dtree.tree_
+    class_names = class_labels(dtree, class_names)
+
+    def node(index):
+        # scikit-learn >= 1.4 stores class proportions in ``value``, older
+        # versions weighted counts; normalizing gives counts for both
+        value = tree.value[index][0]
+        counts = value / value.sum() * tree.weighted_n_node_samples[index]
+        described = {
+            'node': int(index),
+            'samples': int(tree.n_node_samples[index]),
+            'value': dict(zip(class_names, counts.tolist())),
+            'class': class_names[int(np.argmax(counts))],
+        }
+        if tree.children_left[index] != tree.children_right[index]:
+            described['feature'] = feature_names[tree.feature[index]]
+            described['threshold'] = float(tree.threshold[index])
+            described['left'] = node(tree.children_left[index])
+            described['right'] = node(tree.children_right[index])
+        return described
+
+    return node(0)
+
+
+def tree_to_dot(dtree, feature_names, class_names=None):
+    from sklearn.tree import export_graphviz
+
+    # Same look as Figures 11 and 12
+    return export_graphviz(dtree, out_file=None, feature_names=list(feature_names),
+                           class_names=class_labels(dtree, class_names), filled=True, rounded=True,
+                           impurity=False, label='none', precision=2)
+
+
+def export_tree(dtree, path, feature_names, class_names=CLASS_NAMES, formats=('txt', 'json', 'dot')):
+    """Write the tree to ``path`` + ``.txt``/``.json``/``.dot`` and return the paths.
+
+    Render a DOT file with Graphviz, e.g. ``dot -Tsvg tree.dot -o tree.svg``.
+    """
+    feature_names = list(feature_names)
+    writers = {
+        'txt': lambda: tree_to_text(dtree, feature_names),
+        'json': lambda: json.dumps(tree_to_dict(dtree, feature_names, class_names), indent=1),
+        'dot': lambda: tree_to_dot(dtree, feature_names, class_names),
+    }
+    paths = []
+    for extension in formats:
+        file_path = f'{path}.{extension}'
+        with open(file_path, 'w') as file:
+            file.write(writers[extension]())
+        paths.append(file_path)
+    return paths
+
+
+def _setup(shared, columns, y, model, scoring):
+    from sklearn.metrics import get_scorer
+
+    # ``shared`` holds one feature per row
+    _worker.update(shared=shared, buffer=np.empty(shared.shape[1]), columns=columns,
+                   y=y, model=model, scorer=get_scorer(scoring))
+
+
+def _permuted_scores(feature, seeds):
+    shared, buffer = _worker['shared'], _worker['buffer']
+    values = [buffer if index == feature else shared[index] for index in range(len(shared))]
+    X = pd.DataFrame(dict(zip(_worker['columns'], values)), copy=False)
+    scores = []
+    for seed in seeds:
+        buffer[:] = np.random.default_rng(seed).permutation(shared[feature])
+        scores.append(_worker['scorer'](_worker['model'], X, _worker['y']))
+    return feature, scores
+
+
+def permutation_importance(model, X_test, y_test, n_repeats=10, scoring='accuracy',
+                           max_workers=None, seed=676):
+    """Drop in held-out score when each column of ``X_test`` is shuffled.
+
+    ``scoring`` is any scikit-learn scorer name.  Returns one row per feature
+    with the mean and standard deviation of the drop over ``n_repeats``
+    shuffles, largest first.  ``max_workers=1`` shuffles in this process
+    without starting a pool.
+    """
+    from sklearn.metrics import get_scorer
+
+    columns = list(X_test.columns)
+    values = X_test.to_numpy(dtype=float)
+    y = np.asarray(y_test)
+    baseline = get_scorer(scoring)(model, X_test, y)
+    seeds = np.random.SeedSequence(seed).generate_state(len(columns) * n_repeats).reshape(len(columns), -1)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(columns))
+
+    with worker_pool(_worker, _setup, (values.T,), (columns, y, model, scoring), max_workers) as pool:
+        results = dict(pool.map(_permuted_scores, range(len(columns)), seeds.tolist()))
+
+    drops = baseline - np.array([results[feature] for feature in range(len(columns))])
+    importance = pd.DataFrame({
+        'feature': columns,
+        'importance_mean': drops.mean(axis=1),
+        'importance_std': drops.std(axis=1),
+    })
+    importance.attrs['baseline_score'] = baseline
+    return importance.sort_values('importance_mean', ascending=False, ignore_index=True)
@@ -0,0 +1,66 @@
+"""Shared fixtures: a small synthetic copy of the raw CCRB export."""
+
+import contextlib
+import io
+import pathlib
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SCRIPT = pathlib.Path(__file__).resolve().parents[1] / 'Course-project-NYPD-misconduct.py'
+RAW_CSV = 'CCRB Complaint Database Raw 04.28.2023.csv'
+
+
+def make_raw(n=4000, seed=1):
+    """Raw columns with the spellings, gaps and out-of-range values of the real export."""
+    rng = np.random.default_rng(seed)
+
+    def choice(levels):
+        return rng.choice(np.array(levels, dtype=object), n)
+
+    dates = [f'{month:02d}/{day:02d}/{year}' if keep else None
+             for month, day, year, keep in zip(rng.integers(1, 13, n), rng.integers(1, 28, n),
+                                               rng.integers(1998, 2024, n), rng.random(n) > 0.05)]
+    return pd.DataFrame({
+        'PenaltyCat': choice(['No Discipline', 'Command Discipline A', 'Pending', 'Reprimand',
+                              'Suspension (10 days)', 'Loss of Vacation', 'Termination',
+                              'Instructions', None, 'Formalized Training']),
+        'ImpactedGender': choice(['Male', 'Female', 'Male/Man', 'Female/Woman', 'Non-binary', None]),
+        'OfficerGender': choice(['Male', 'Female']),
+        'ImpactedRace': choice(['White', 'Black', 'Hispanic', 'Unknown', 'Refused',
+                                'Decline to Answer (NA)', 'White/Caucasian (R)', None, 'Asian']),
+        'OfficerRace': choice(['White', 'Black', 'Hispanic', 'Asian']),
+        'ImpactedAge': np.where(rng.random(n) < 0.1, np.nan, rng.integers(-5, 120, n)),
+        'CurrentRankLong': choice(['Police Officer', 'Detective', 'Sergeant', 'Lieutenant', 'Captain',
+                                   'Deputy Inspector', 'Chiefs and other ranks', 'Inspector']),
+        'FADOType': choice(['Abuse of Authority', 'Force', 'Discourtesy', 'Offensive Language',
+                            'Untruthful Statement', None]),
+        'IncidentDate': dates,
+    })
+
+
+@pytest.fixture(scope='session')
+def raw_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp('raw') / 'raw.csv'
+    make_raw().to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope='session')
+def script_new_df(raw_csv):
+    """``new_df`` of Section 4-1, from running the script up to 4-1-1 on ``raw_csv``."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    source = SCRIPT.read_text().replace(repr(RAW_CSV), repr(str(raw_csv)))
+    source = source[:source.index('# ### 4-1-1.')]
+    namespace = {}
+    # The script's own plotting warnings are not what these tests check
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        exec(compile(source, str(SCRIPT), 'exec'), namespace)
+    plt.close('all')
+    return namespace['new_df']
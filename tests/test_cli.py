@@ -0,0 +1,22 @@
+import pytest
+
+from nypd_misconduct.cli import main
+
+
+@pytest.fixture(scope='module')
+def recoded(raw_csv, tmp_path_factory):
+    path = tmp_path_factory.mktemp('recoded') / 'categories.csv'
+    main(['recode', str(raw_csv), str(path), '--outcome', 'Penalty_categories'])
+    return path
+
+
+def test_recoded_frame_without_outcome_is_rejected(recoded, capsys):
+    with pytest.raises(SystemExit) as error:
+        main(['logit', str(recoded)])
+    assert "without 'Penalty_binary'" in str(error.value)
+    assert "recode --outcome Penalty_binary" in str(error.value)
+
+
+def test_recoded_frame_with_outcome_is_read(recoded, capsys):
+    main(['tree', str(recoded)])
+    assert 'Accuracy:' in capsys.readouterr().out
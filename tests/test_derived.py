@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from conftest import make_raw
+from nypd_misconduct.derived import FIGURE_COLUMNS, LazyFrame, plan, raw_sources
+
+
+def test_model_frame_matches_script(raw_csv, script_new_df):
+    new_df = LazyFrame(raw_csv).model_frame('Penalty_binary')
+    pd.testing.assert_frame_equal(new_df, script_new_df, check_dtype=False)
+
+
+def test_parquet_and_frame_sources_match_csv(raw_csv, tmp_path):
+    raw = pd.read_csv(raw_csv, low_memory=False)
+    parquet = tmp_path / 'raw.parquet'
+    raw.to_parquet(parquet)
+    expected = LazyFrame(raw_csv).model_frame('Penalty_categories')
+    for source in (parquet, raw):
+        pd.testing.assert_frame_equal(LazyFrame(source).model_frame('Penalty_categories'), expected)
+
+
+def test_compute_reads_only_needed_columns():
+    raw = make_raw(200)
+    lazy = LazyFrame(raw[raw_sources(FIGURE_COLUMNS[9])])
+    result = lazy.compute(FIGURE_COLUMNS[9])
+    assert list(result.columns) == FIGURE_COLUMNS[9]
+    assert set(raw_sources(FIGURE_COLUMNS[9])) == {'OfficerRace', 'ImpactedRace'}
+
+
+def test_plan_skips_available_columns():
+    assert plan(['Race_mismatch'], available=['Police_race_white', 'Impacted_race_white']) == ['Race_mismatch']
+
+
+def test_kept_columns_are_reused():
+    raw = make_raw(200)
+    lazy = LazyFrame(raw)
+    kept = lazy.compute(['Police_race_white'], keep=True)
+    # The raw race column is no longer available, so the kept column must be used
+    lazy.source = raw.drop(columns='OfficerRace')
+    result = lazy.compute(['Race_mismatch', 'Police_race_white'])
+    pd.testing.assert_series_equal(result['Police_race_white'], kept['Police_race_white'])
+    lazy.release()
+    assert not lazy.cache
+
+
+def test_unmatched_penalties_warn_once(capsys):
+    raw = make_raw(500)
+    with pytest.warns(UserWarning, match='Unspecified') as record:
+        categories = LazyFrame(raw).compute(['Penalty_categories'])['Penalty_categories']
+    assert len(record) == 1
+    unspecified = (categories == 'Unspecified').to_numpy()
+    unmatched = sorted({str(value) for value in raw.loc[unspecified, 'PenaltyCat']})
+    assert str(unmatched) in str(record[0].message)
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,57 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nypd_misconduct.disparity import penalty_disparities
+
+
+def _frame(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Police_race_white': rng.integers(0, 2, n).astype(float),
+        'Impacted_race_white': rng.integers(0, 2, n).astype(float),
+        'FADO_recoded': rng.choice(['Abuse of authority', 'Discourtesy', 'Force'], n),
+        'Penalty_binary': (rng.random(n) < 0.1).astype(float),
+    })
+    # One cell without any penalty, where the ratio interval is undefined
+    df.loc[df['FADO_recoded'] == 'Discourtesy', 'Penalty_binary'] = 0.0
+    return df
+
+
+def test_rates_match_groupby():
+    df = _frame()
+    dimensions = ['Police_race_white', 'FADO_recoded']
+    result = penalty_disparities(df, dimensions=dimensions, cache=False)
+    one = result[(result['n_dimensions'] == 1) & result['FADO_recoded'].notna()]
+    expected = df.groupby('FADO_recoded')['Penalty_binary'].mean()
+    np.testing.assert_allclose(one.set_index('FADO_recoded')['rate'].loc[expected.index], expected)
+
+
+@pytest.mark.parametrize('n_boot', [0, 50])
+def test_empty_cells_do_not_warn(n_boot):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        result = penalty_disparities(_frame(), dimensions=['Police_race_white', 'FADO_recoded'],
+                                     n_boot=n_boot, cache=False)
+    no_penalty = result[result['penalties'] == 0]
+    assert len(no_penalty)
+    assert (no_penalty['rate_ratio'] == 0).all() and no_penalty['ratio_upper'].isna().all()
+
+
+def test_bootstrap_intervals():
+    df = _frame()
+    dimensions = ['Police_race_white', 'FADO_recoded']
+    result = penalty_disparities(df, dimensions=dimensions, n_boot=200, cache=False)
+    again = penalty_disparities(df, dimensions=dimensions, n_boot=200, cache=False)
+    pd.testing.assert_frame_equal(result, again)
+    penalized = result[result['penalties'] > 0]
+    assert (penalized['rate_boot_lower'] <= penalized['rate']).all()
+    assert (penalized['rate'] <= penalized['rate_boot_upper']).all()
+    # Close to the Wilson interval when the cells are large
+    overall = result[result['n_dimensions'] == 0].iloc[0]
+    assert overall['rate_boot_lower'] == pytest.approx(overall['rate_lower'], abs=0.01)
+    assert overall['rate_boot_upper'] == pytest.approx(overall['rate_upper'], abs=0.01)
+    # The ratio of the whole data to nothing else is undefined in every draw
+    assert np.isnan(overall['ratio_boot_lower']) and np.isnan(overall['ratio_boot_upper'])
@@ -0,0 +1,64 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nypd_misconduct.imputation import AUXILIARY, IMPUTED, complete, multiple_imputation, rubin
+
+
+@pytest.fixture(scope='module')
+def observed():
+    rng = np.random.default_rng(3)
+    n = 4000
+    data = pd.DataFrame({name: rng.integers(0, 2, n).astype(float) for name in IMPUTED})
+    data['Impacted_age_recoded'] = rng.integers(10, 80, n).astype(float)
+    fado = rng.integers(0, 4, n)
+    for level, name in enumerate(AUXILIARY[:3], start=1):
+        data[name] = (fado == level).astype(float)
+    data['IncidentYear'] = rng.integers(2000, 2023, n).astype(float)
+    data['outcome'] = (rng.random(n) < 0.3).astype(float)
+    for name in IMPUTED:
+        data.loc[rng.random(n) < 0.15, name] = np.nan
+    return data.to_numpy(), list(data.columns)
+
+
+def test_complete_fills_only_missing_values(observed):
+    values, columns = observed
+    with warnings.catch_warnings():
+        # Raw IncidentYear used to make the parameter covariance indefinite
+        warnings.simplefilter('error', RuntimeWarning)
+        completed = complete(values, columns, IMPUTED, seed=0)
+    missing = np.isnan(values)
+    assert not np.isnan(completed).any()
+    np.testing.assert_array_equal(completed[~missing], values[~missing])
+    age = completed[:, columns.index('Impacted_age_recoded')]
+    assert age.min() >= 10 and age.max() <= 99
+    binary = completed[:, columns.index('Police_sex_male')]
+    assert set(np.unique(binary)) <= {0.0, 1.0}
+
+
+def test_rubin_without_between_variance():
+    params = np.tile([1.0, -2.0], (5, 1))
+    covariances = np.tile(np.diag([0.04, 0.25]), (5, 1, 1))
+    pooled = rubin(params, covariances)
+    np.testing.assert_allclose(pooled['coef'], [1.0, -2.0])
+    np.testing.assert_allclose(pooled['std_err'], [0.2, 0.5])
+    np.testing.assert_allclose(pooled['fmi'], 0.0)
+
+
+@pytest.fixture(scope='module')
+def frame(observed):
+    values, columns = observed
+    df = pd.DataFrame(values, columns=columns).rename(columns={'outcome': 'Penalty_binary'})
+    rng = np.random.default_rng(4)
+    df['Penalty_categories'] = np.where(df['Penalty_binary'] == 1,
+                                        rng.choice(['Charges', 'Command', 'Instructions'], len(df)), None)
+    return df
+
+
+@pytest.mark.parametrize('model', ['logit', 'tree'])
+def test_in_process_matches_pool(frame, model):
+    inline = multiple_imputation(frame, model=model, m=2, n_iter=2, max_workers=1)
+    pooled = multiple_imputation(frame, model=model, m=2, n_iter=2, max_workers=2)
+    pd.testing.assert_frame_equal(inline, pooled)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nypd_misconduct.multinomial import SEVERITY, MultinomialLogit, fit_multinomial_specifications
+
+sm = pytest.importorskip('statsmodels.api')
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(4)
+    n = 2500
+    df = pd.DataFrame({
+        'Police_rank_mangerial': rng.integers(0, 2, n).astype(float),
+        'Race_mismatch': rng.integers(0, 2, n).astype(float),
+        'Impacted_age_recoded': rng.integers(10, 80, n).astype(float),
+    })
+    latent = (0.5 * df['Police_rank_mangerial'] - 0.3 * df['Race_mismatch']
+              + 0.01 * df['Impacted_age_recoded'] + rng.logistic(size=n))
+    df['Penalty_categories'] = np.array(SEVERITY, dtype=object)[np.digitize(latent, [0.0, 1.2])]
+    return df
+
+
+FEATURES = ['Police_rank_mangerial', 'Race_mismatch', 'Impacted_age_recoded']
+
+
+@pytest.mark.parametrize('cov_type', ['nonrobust', 'HC0'])
+def test_multinomial_matches_mnlogit(frame, cov_type):
+    model = MultinomialLogit(cov_type=cov_type).fit(frame[FEATURES], frame['Penalty_categories'])
+    codes = pd.Categorical(frame['Penalty_categories'], categories=SEVERITY).codes
+    reference = sm.MNLogit(codes, sm.add_constant(frame[FEATURES])).fit(
+        method='newton', cov_type=cov_type, tol=1e-12, disp=False)
+    # statsmodels stacks one column per equation
+    np.testing.assert_allclose(model.params_, np.asarray(reference.params).T.ravel(), rtol=1e-9, atol=1e-10)
+    np.testing.assert_allclose(np.sqrt(np.diag(model.cov_params_)), np.asarray(reference.bse).T.ravel(),
+                               rtol=1e-9)
+    assert model.loglik_ == pytest.approx(reference.llf, rel=1e-12)
+
+
+def test_ordinal_matches_ordered_model(frame):
+    from statsmodels.miscmodels.ordinal_model import OrderedModel
+
+    model = MultinomialLogit(model='ordinal', cov_type='nonrobust').fit(
+        frame[FEATURES], frame['Penalty_categories'])
+    endog = pd.Series(pd.Categorical(frame['Penalty_categories'], categories=SEVERITY, ordered=True))
+    ordered = OrderedModel(endog, frame[FEATURES], distr='logit')
+    reference = ordered.fit(method='newton', tol=1e-12, maxiter=100, disp=False)
+    k = len(FEATURES)
+    thresholds = ordered.transform_threshold_params(np.asarray(reference.params))[1:-1]
+    np.testing.assert_allclose(model.params_[:-k], thresholds, atol=1e-7)
+    np.testing.assert_allclose(model.params_[-k:], np.asarray(reference.params)[:k], atol=1e-7)
+    # OrderedModel's standard errors come from a numerical Hessian
+    np.testing.assert_allclose(np.sqrt(np.diag(model.cov_params_))[-k:], np.asarray(reference.bse)[:k],
+                               rtol=1e-4)
+    assert model.loglik_ == pytest.approx(reference.llf, rel=1e-10)
+
+
+@pytest.mark.parametrize('kind', ['multinomial', 'ordinal'])
+def test_specifications_match_direct_fit(frame, kind):
+    formulas = {'base': 'Penalty_categories ~ ' + ' + '.join(FEATURES)}
+    table = fit_multinomial_specifications(frame, formulas, model=kind, max_workers=1)
+    model = MultinomialLogit(model=kind).fit(frame[FEATURES], frame['Penalty_categories'])
+    direct = model.summary()
+    np.testing.assert_allclose(table['coef'], direct['coef'], rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(table['std_err'], direct['std_err'], rtol=1e-10)
+    assert list(table['term']) == list(direct['term'])
+    assert table['converged'].all()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_raw
+from nypd_misconduct.derived import LazyFrame
+from nypd_misconduct.regularized import FACTORS as ALL_FACTORS, interaction_design, regularized_logit
+
+FACTORS = {'Race_mismatch': 0.0, 'FADO_recoded': 'Abuse of authority', 'Police_rank_mangerial': 0.0}
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(2)
+    n = 3000
+    df = pd.DataFrame({
+        'Race_mismatch': rng.integers(0, 2, n).astype(float),
+        'FADO_recoded': rng.choice(['Abuse of authority', 'Discourtesy', 'Force', 'Offensive language'], n),
+        'Police_rank_mangerial': rng.integers(0, 2, n).astype(float),
+        'Impacted_age_recoded': rng.integers(10, 80, n).astype(float),
+    })
+    force = (df['FADO_recoded'] == 'Force').to_numpy()
+    eta = -1.5 + 0.6 * df['Police_rank_mangerial'] + 1.0 * df['Race_mismatch'] * force
+    df['Penalty_binary'] = (rng.random(n) < 1 / (1 + np.exp(-eta))).astype(float)
+    df.loc[rng.random(n) < 0.05, 'Race_mismatch'] = np.nan
+    return df
+
+
+def test_interaction_design_columns(frame):
+    data = frame.dropna()
+    X, columns, _, _ = interaction_design(data, FACTORS)
+    # 1 + 3 + 1 main effects, 3 + 1 + 3 pairs, 3 triples
+    assert X.shape == (len(data), 15)
+    assert 'Race_mismatch:FADO_recoded[Force]:Police_rank_mangerial' in columns
+    # Each row has one active column per factor combination it belongs to
+    dense = X.toarray()
+    position = columns.index('Race_mismatch:FADO_recoded[Force]')
+    expected = data['Race_mismatch'].to_numpy() * (data['FADO_recoded'] == 'Force').to_numpy()
+    np.testing.assert_array_equal(dense[:, position], expected)
+
+
+def test_chosen_coefficients_match_sklearn(frame):
+    from sklearn.linear_model import LogisticRegression
+
+    terms, path = regularized_logit(frame, factors=FACTORS, numeric=(), n_lambdas=8, cv=3,
+                                    max_workers=1, tol=1e-10, max_iter=20000)
+    lam = path.loc[path['chosen'], 'lambda'].item()
+    data = frame.dropna()
+    X, columns, _, _ = interaction_design(data, FACTORS)
+    # mean log-loss + lambda |b|_1 is sklearn's objective with C = 1 / (n lambda)
+    reference = LogisticRegression(C=1 / (len(data) * lam), l1_ratio=1.0, solver='saga',
+                                   tol=1e-12, max_iter=100000)
+    reference.fit(X.toarray(), data['Penalty_binary'])
+    coef = terms.set_index('term')['coef']
+    np.testing.assert_allclose(coef[columns], reference.coef_[0], atol=1e-4)
+    assert coef['const'] == pytest.approx(reference.intercept_[0], abs=1e-4)
+    assert terms.set_index('term').loc['Race_mismatch:FADO_recoded[Force]', 'selected']
+
+
+def test_in_process_matches_pool(frame):
+    options = dict(factors=FACTORS, l1_ratios=(0.5, 1.0), n_lambdas=5, cv=3)
+    inline_terms, inline_path = regularized_logit(frame, max_workers=1, **options)
+    terms, path = regularized_logit(frame, max_workers=2, **options)
+    pd.testing.assert_frame_equal(inline_terms, terms)
+    pd.testing.assert_frame_equal(inline_path, path)
+
+
+@pytest.mark.parametrize('seed', [1, 4])
+def test_nothing_is_selected_at_lambda_max(seed):
+    # On these samples the proximal step left terms at -1e-16 instead of 0
+    df = LazyFrame(make_raw(6000, seed)).compute(['Penalty_binary', 'Impacted_age_recoded'] + list(ALL_FACTORS))
+    terms, path = regularized_logit(df, n_lambdas=1, cv=3, max_workers=1)
+    assert (terms.loc[terms['term'] != 'const', 'coef'] == 0).all()
+    assert not terms['selected'].any()
+    assert path['n_nonzero'].item() == 0 and path['converged'].item()
+
+
+def test_max_iter_running_out_warns(frame):
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        _, path = regularized_logit(frame, factors=FACTORS, n_lambdas=3, cv=3, max_workers=1, max_iter=2)
+    assert not path['converged'].any()
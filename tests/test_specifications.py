@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nypd_misconduct.columns import BASE_FEATURES, YEAR_DUMMIES
+from nypd_misconduct.specifications import _assign_parents, build_design, fit_specifications, parse_formula
+
+sm = pytest.importorskip('statsmodels.api')
+
+BASE_FORMULA = 'Penalty_binary ~ ' + ' + '.join(BASE_FEATURES)
+COLUMNS = ['Penalty_binary', 'a', 'b', 'FADO_Offensive language', 'Year_2009.0', 'Year_2010.0',
+           'Year_2011.0', 'Year_2020.0']
+
+
+@pytest.mark.parametrize('formula, terms, has_const', [
+    ('Penalty_binary ~ a + b', [('a',), ('b',)], True),
+    ('Penalty_binary ~ a + b - 1', [('a',), ('b',)], False),
+    ('Penalty_binary ~ 0 + a', [('a',)], False),
+    ('Penalty_binary ~ 0 + a + 1', [('a',)], True),
+    ('Penalty_binary ~ a + b - a', [('b',)], True),
+    ('Penalty_binary ~ a + a', [('a',)], True),
+    ('Penalty_binary ~ a + a:b', [('a',), ('a', 'b')], True),
+    ('Penalty_binary ~ FADO_Offensive language + a', [('FADO_Offensive language',), ('a',)], True),
+    ('Penalty_binary ~ Year_*', [('Year_2009.0',), ('Year_2010.0',), ('Year_2011.0',), ('Year_2020.0',)],
+     True),
+    ('Penalty_binary ~ Year_201?.0 - Year_2010.0', [('Year_2011.0',)], True),
+    ('Penalty_binary ~ a:Year_201?.0', [('a', 'Year_2010.0'), ('a', 'Year_2011.0')], True),
+])
+def test_parse_formula(formula, terms, has_const):
+    assert parse_formula(formula, COLUMNS) == ('Penalty_binary', terms, has_const)
+
+
+@pytest.mark.parametrize('formula, error', [
+    ('Penalty_binary ~ c', KeyError),
+    ('Penalty_binary ~ Year_199*', KeyError),
+    ('outcome ~ a', KeyError),
+    ('Penalty_binary ~ a ~ b', ValueError),
+    ('Penalty_binary a', ValueError),
+])
+def test_parse_formula_errors(formula, error):
+    with pytest.raises(error):
+        parse_formula(formula, COLUMNS)
+
+
+def test_build_design_products_and_subsets():
+    df = pd.DataFrame({'Penalty_binary': [0, 1, 1, 0, 1], 'a': [1.0, 2.0, np.nan, 4.0, 5.0],
+                       'b': [3.0, 0.0, 1.0, 2.0, 1.0], 'year': [2008, 2012, 2015, 2009, 2011]})
+    y, X, specs, rows = build_design(df, ['Penalty_binary ~ a:b - 1', 'Penalty_binary ~ b'],
+                                     [None, 'year >= 2010'])
+    # One common sample: the row missing ``a`` is dropped from both
+    assert list(y.index) == [0, 1, 3, 4]
+    assert list(X['a:b']) == [3.0, 0.0, 8.0, 5.0]
+    assert specs == [['a:b'], ['const', 'b']]
+    assert rows[0] is None
+    assert list(rows[1]) == [1, 3]
+
+
+def test_assign_parents_warm_starts_siblings_from_the_root():
+    specs = [['const', 'a', 'b', 'c'], ['const', 'a'], ['const', 'a', 'b'], ['d'], ['d', 'e'],
+             ['const', 'a', 'c']]
+    parents, depths = _assign_parents(specs)
+    # The smallest specification is the root of everything sharing a term with it
+    assert parents == [1, None, 1, None, 3, 1]
+    assert depths == [1, 0, 1, 0, 1, 1]
+
+
+def _direct_logit(data, terms, **fit_kwargs):
+    X = sm.add_constant(data[terms].astype(float))
+    return sm.Logit(data['Penalty_binary'].astype(float), X).fit(disp=0, cov_type='HC3', **fit_kwargs)
+
+
+def test_logit_specifications_match_statsmodels(script_new_df):
+    specifications = {
+        '4-1-1': BASE_FORMULA,
+        '4-1-2': BASE_FORMULA + ' + Year_*',
+        'years 2010-2022': BASE_FORMULA + ' + Year_201?.0 + Year_202?.0 - Year_2010.0',
+    }
+    subsets = {'years 2010-2022': 'IncidentYear >= 2010'}
+    table = fit_specifications(script_new_df, specifications, max_workers=1, subsets=subsets)
+
+    window = script_new_df[script_new_df['IncidentYear'] >= 2010]
+    window_years = [dummy for dummy in YEAR_DUMMIES if dummy >= 'Year_2011']
+    references = {
+        '4-1-1': _direct_logit(script_new_df, BASE_FEATURES),
+        '4-1-2': _direct_logit(script_new_df, BASE_FEATURES + YEAR_DUMMIES),
+        'years 2010-2022': _direct_logit(window, BASE_FEATURES + window_years),
+    }
+    for label, reference in references.items():
+        fit = table[table['specification'] == label].set_index('term')
+        assert list(fit.index) == list(reference.params.index)
+        np.testing.assert_allclose(fit['coef'], reference.params, rtol=1e-6, atol=1e-8)
+        np.testing.assert_allclose(fit['std_err'], reference.bse, rtol=1e-6)
+        assert (fit['nobs'] == reference.nobs).all()
+        assert fit['converged'].all()
+
+    assert table.groupby('specification')['warm_start_from'].first().to_dict() == {
+        '4-1-1': None, '4-1-2': '4-1-1', 'years 2010-2022': '4-1-1'}
+    assert set(table.loc[table['specification'] == 'years 2010-2022', 'subset']) == {'IncidentYear >= 2010'}
+
+
+def test_lpm_matches_ols(script_new_df):
+    table = fit_specifications(script_new_df, [BASE_FORMULA + ' - 1'], family='lpm', max_workers=1)
+    reference = sm.OLS(script_new_df['Penalty_binary'].astype(float),
+                       script_new_df[BASE_FEATURES].astype(float)).fit(cov_type='HC3')
+    np.testing.assert_allclose(table['coef'], reference.params, rtol=1e-10)
+    np.testing.assert_allclose(table['std_err'], reference.bse, rtol=1e-10)
+
+
+def test_pool_matches_in_process(script_new_df):
+    specifications = [BASE_FORMULA, BASE_FORMULA + ' + Year_*', BASE_FORMULA + ' + Race_mismatch:FADO_Force']
+    inline = fit_specifications(script_new_df, specifications, max_workers=1)
+    pooled = fit_specifications(script_new_df, specifications, max_workers=2)
+    pd.testing.assert_frame_equal(inline, pooled)
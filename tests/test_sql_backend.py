@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+
+from nypd_misconduct.derived import LazyFrame
+from nypd_misconduct.sql_backend import build_new_df, to_parquet, value_counts
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+def test_build_new_df_matches_script(raw_csv, script_new_df, threads):
+    new_df = build_new_df(raw_csv, threads=threads)
+    pd.testing.assert_frame_equal(new_df, script_new_df, check_dtype=False)
+
+
+def test_categories_match_pandas(raw_csv):
+    expected = LazyFrame(raw_csv, low_memory=False).model_frame('Penalty_categories')
+    new_df = build_new_df(raw_csv, outcome='Penalty_categories', threads=1)
+    pd.testing.assert_frame_equal(new_df, expected, check_dtype=False)
+
+
+def test_parquet_source_matches_csv(raw_csv, tmp_path):
+    parquet = tmp_path / 'raw.parquet'
+    to_parquet(raw_csv, parquet)
+    pd.testing.assert_frame_equal(build_new_df(parquet), build_new_df(raw_csv))
+
+
+def test_value_counts_match_pandas(raw_csv):
+    expected = LazyFrame(raw_csv, low_memory=False).compute(['FADO_recoded'])['FADO_recoded'].value_counts()
+    counts = value_counts(raw_csv, 'FADO_recoded')
+    pd.testing.assert_series_equal(counts.sort_index(), expected.sort_index(), check_names=False,
+                                   check_dtype=False, check_index_type=False)
+
+
+def test_parquet_copy_is_a_lazyframe_source(raw_csv, tmp_path):
+    parquet = tmp_path / 'raw.parquet'
+    to_parquet(raw_csv, parquet)
+    for outcome in ['Penalty_binary', 'Penalty_categories']:
+        expected = LazyFrame(raw_csv, low_memory=False).model_frame(outcome)
+        pd.testing.assert_frame_equal(LazyFrame(parquet).model_frame(outcome), expected, check_dtype=False)
+
+
+def test_parquet_written_by_pandas_matches_csv(raw_csv, tmp_path):
+    parquet = tmp_path / 'pandas.parquet'
+    pd.read_csv(raw_csv, low_memory=False).to_parquet(parquet)
+    pd.testing.assert_frame_equal(build_new_df(parquet), build_new_df(raw_csv))
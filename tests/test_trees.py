@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from nypd_misconduct.trees import export_tree, permutation_importance, tree_to_dict
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 2, (600, 4)).astype(float), columns=['a', 'b', 'c', 'd'])
+    y = np.where(X['a'] == 1, 'Charges', np.where(X['b'] == 1, 'C-discipline', 'Instructions'))
+    y = np.where(rng.random(600) < 0.1, 'Instructions', y)
+    return DecisionTreeClassifier(max_depth=3, random_state=0).fit(X, y), X, y
+
+
+def test_tree_to_dict_counts_samples(fitted):
+    dtree, X, y = fitted
+    root = tree_to_dict(dtree, list(X.columns))
+    assert root['samples'] == len(X)
+    counts = pd.Series(y).value_counts()
+    for label, count in zip(dtree.classes_, root['value'].values()):
+        assert count == pytest.approx(counts[label])
+    left, right = root['left'], root['right']
+    assert sum(left['value'].values()) == pytest.approx(left['samples'])
+    assert sum(right['value'].values()) == pytest.approx(right['samples'])
+
+
+def test_export_tree_writes_every_format(fitted, tmp_path):
+    dtree, X, _ = fitted
+    paths = export_tree(dtree, tmp_path / 'tree', feature_names=X.columns)
+    assert [path.rsplit('.', 1)[1] for path in paths] == ['txt', 'json', 'dot']
+    with open(paths[1]) as file:
+        assert json.load(file)['feature'] == 'a'
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_permutation_importance_matches_serial_shuffles(fitted, max_workers):
+    dtree, X, y = fitted
+    importance = permutation_importance(dtree, X, y, n_repeats=3, max_workers=max_workers, seed=5)
+    seeds = np.random.SeedSequence(5).generate_state(X.shape[1] * 3).reshape(X.shape[1], -1)
+    baseline = dtree.score(X, y)
+    for feature, column in enumerate(X.columns):
+        drops = []
+        for seed in seeds[feature]:
+            shuffled = X.assign(**{column: np.random.default_rng(seed).permutation(X[column].to_numpy())})
+            drops.append(baseline - dtree.score(shuffled, y))
+        row = importance.set_index('feature').loc[column]
+        assert row['importance_mean'] == pytest.approx(np.mean(drops))
+    assert importance.attrs['baseline_score'] == pytest.approx(baseline)
+    assert importance['importance_mean'].iloc[0] == importance['importance_mean'].max()